@@ -1,3 +1,11 @@
-from athena_dr.agent.deep_research import AnswerType, DeepResearchAgent
-
 __all__ = ["AnswerType", "DeepResearchAgent"]
+
+
+def __getattr__(name: str):
+    # Import the agent lazily so that importing a submodule such as
+    # athena_dr.agent.tools doesn't pull in the whole agent stack
+    if name in __all__:
+        from athena_dr.agent import deep_research
+
+        return getattr(deep_research, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+
+def make_key(**parts: Any) -> str:
+    """Build a stable cache key by hashing the canonical JSON of the given parts."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# Numbers such as years, amounts and dates, and capitalized words after the
+# first one, which are usually names
+_NUMBER_RE = re.compile(r"\d+(?:[.,:/-]\d+)*")
+_NAME_RE = re.compile(r"(?<=\s)[A-Z][\w'-]*")
+
+
+def _key_tokens(query: str) -> frozenset[str]:
+    """Return the numbers and names that two queries must share to match.
+
+    Sentence embeddings barely move when only a year or a name changes, so
+    "the 2018 World Cup" and "the 2022 World Cup" can score above any useful
+    threshold.
+    """
+    return frozenset(_NUMBER_RE.findall(query)) | frozenset(
+        name.lower() for name in _NAME_RE.findall(query)
+    )
+
+
+@dataclass
+class _SemanticCacheEntry:
+    namespace: str
+    key_tokens: frozenset[str]
+    embedding: Any
+    value: Any
+    expires_at: float
+
+
+class SemanticCache:
+    """
+    In-memory cache that matches queries by embedding similarity instead of
+    exact string equality, so paraphrased queries can reuse a previous result.
+
+    Embeddings are produced by a small sentence-transformers model which is
+    only loaded on first use, keeping the dependency optional. Install it with
+    the `semantic-cache` extra.
+
+    Similarity alone is not enough for a hit: the numbers and capitalized
+    names in both queries must also be the same, since swapping a year or an
+    entity changes the answer but hardly changes the embedding.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        ttl: float = 3600,
+        max_size: int = 4096,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self.model_name = model_name
+        self._encoder = None
+        self._entries: OrderedDict[int, _SemanticCacheEntry] = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str):
+        if self._encoder is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError as e:
+                raise ImportError(
+                    "SemanticCache requires sentence-transformers and numpy; install "
+                    "them with `pip install 'athena_dr[semantic-cache]'`"
+                ) from e
+
+            self._encoder = SentenceTransformer(self.model_name)
+        # Normalized embeddings make the inner product equal to cosine similarity
+        return self._encoder.encode(text, normalize_embeddings=True)
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [
+            entry_id
+            for entry_id, entry in self._entries.items()
+            if entry.expires_at <= now
+        ]
+        for entry_id in expired:
+            del self._entries[entry_id]
+
+    def get(self, namespace: str, query: str) -> Any | None:
+        """Return the cached value of the most similar query, or None on a miss."""
+        # Embed first, so a missing extra raises the ImportError from _embed
+        embedding = self._embed(query)
+        import numpy as np
+
+        key_tokens = _key_tokens(query)
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            candidates = [
+                entry
+                for entry in self._entries.values()
+                if entry.namespace == namespace and entry.key_tokens == key_tokens
+            ]
+            if not candidates:
+                return None
+            similarities = (
+                np.stack([entry.embedding for entry in candidates]) @ embedding
+            )
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            return candidates[best].value
+
+    def put(self, namespace: str, query: str, value: Any) -> None:
+        embedding = self._embed(query)
+        with self._lock:
+            self._entries[self._next_id] = _SemanticCacheEntry(
+                namespace=namespace,
+                key_tokens=_key_tokens(query),
+                embedding=embedding,
+                value=value,
+                expires_at=time.monotonic() + self.ttl,
+            )
+            self._next_id += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory LRU cache whose entries expire after a TTL. It has
+    the same get/set interface as DiskCache, so the two are interchangeable.
+    """
+
+    def __init__(self, max_size: int = 512, ttl: float | None = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[Any, float | None]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        """Return the cached value for key, or None when missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class DiskCache:
+    """
+    Persistent key-value cache backed by a SQLite database, so results survive
+    across processes and runs. Values are pickled and may expire after a TTL;
+    expired rows are deleted when the cache is opened and every
+    purge_interval writes after that.
+    """
+
+    def __init__(self, path: str, ttl: float | None = None, purge_interval: int = 1000):
+        path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        # WAL lets concurrent processes read while one of them writes
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)"
+        )
+        self._purge_expired()
+
+    def _purge_expired(self) -> None:
+        self._connection.execute(
+            "DELETE FROM cache WHERE expires_at <= ?", (time.time(),)
+        )
+
+    def get(self, key: str) -> Any | None:
+        """Return the cached value for key, or None when missing or expired."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return pickle.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, pickle.dumps(value), expires_at),
+            )
+            self._writes += 1
+            if self._writes % self.purge_interval == 0:
+                self._purge_expired()
@@ -1,27 +1,36 @@
+import itertools
+import logging
+import os
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from enum import Enum
-from typing import Any, Tuple
+from typing import TYPE_CHECKING, Any, Literal, Tuple
 
+import openai
+import requests
 import weave
-from datasets import Dataset
-from rich.progress import (
-    BarColumn,
-    Progress,
-    SpinnerColumn,
-    TaskProgressColumn,
-    TextColumn,
-    TimeElapsedColumn,
-)
 from smolagents import (
     ActionStep,
     AgentLogger,
+    ChatMessage,
+    MessageRole,
     Model,
     MultiStepAgent,
 )
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
 
+from athena_dr.agent.cache import DiskCache, SemanticCache, TTLCache, make_key
 from athena_dr.agent.model import OpenAIModelWithThinkingTraces
 from athena_dr.agent.prompts import (
+    DIRECT_ANSWER_PROMPT_TEMPLATE,
     EXACT_ANSWER_PROMPT_TEMPLATE,
     LONG_ANSWER_PROMPT_TEMPLATE,
     SHORT_ANSWER_PROMPT_TEMPLATE,
@@ -38,7 +47,45 @@ from athena_dr.agent.tools import (
     SerperSearchTool,
     TheSportsDBSearchTool,
 )
-from athena_dr.utils import WorkflowConfig
+from athena_dr.utils import WorkflowConfig, json_dumps, json_loads
+
+if TYPE_CHECKING:
+    from datasets import Dataset
+
+logger = logging.getLogger(__name__)
+
+_THINKING_RE = re.compile(r"<thinking>.*?</thinking>", re.DOTALL)
+
+# Snippet IDs emitted by the tools (e.g. [serper_1], [s2_paper_1], [pubmed_1]);
+# other bracketed text such as markdown links is not matched
+_SNIPPET_ID_PREFIXES = (
+    "serper_",
+    "s2_paper_",
+    "s2_snippet_",
+    "pubmed_",
+    "crawl4ai_",
+    "jina_",
+    "sportsdb_",
+)
+# Matches either a snippet ID or a "URL: ..." line so observations are scanned once
+_OBSERVATION_CITATION_RE = re.compile(
+    r"\[(?P<snippet_id>(?:%s)[^\]]*)\]|URL: (?P<url>https?://[^\s\n]+)"
+    % "|".join(map(re.escape, _SNIPPET_ID_PREFIXES))
+)
+_CITE_RE = re.compile(r'<cite id="([^"]+)">')
+# Source recorded for cited IDs that no tool observation produced
+_UNKNOWN_CITATION_SOURCE = {"tool": "unknown", "step": None}
+
+# Queries made up only of numbers and arithmetic operators, e.g. "(2 + 3) * 4"
+_ARITHMETIC_QUERY_RE = re.compile(r"[\d\s.,+\-*/%^()=?]*\d[\d\s.,+\-*/%^()=?]*")
+# A binary operator with a numeric operand on each side, so a lone "-5" is not
+# treated as arithmetic
+_BINARY_OPERATION_RE = re.compile(r"[\d.)]\s*(?:\*\*|[+\-*/%^])\s*[+\-]?[\d.(]")
+# Dates and phone numbers that would otherwise pass for subtraction or division,
+# e.g. "2020-01-01", "1/2/2020", "555-1234" or "(555) 123-4567"
+_DATE_OR_PHONE_RE = re.compile(
+    r"\d+(?:[-/]\d+){2,}|\d{1,2}\.\d{1,2}\.\d{4}|\d{3,}-\d{4}|\(\d{3}\)\s*\d{3}"
+)
 
 
 class AnswerType(Enum):
@@ -47,14 +94,59 @@ class AnswerType(Enum):
     EXACT = "exact"
 
 
-@weave.op
-def increment_web_agent_token_counts(
-    final_answer: str, memory_step: int, agent: MultiStepAgent
-):
-    token_counts_web = agent.monitor.get_total_token_counts()
-    token_counts_web.input_tokens += token_counts_web.input_tokens
-    token_counts_web.output_tokens += token_counts_web.output_tokens
-    return True
+# Text before and after the single {query} placeholder of each prompt template,
+# so prompts are built by concatenation instead of str.format
+_PROMPT_PARTS = {
+    answer_type: template.split("{query}")
+    for answer_type, template in (
+        (AnswerType.EXACT, EXACT_ANSWER_PROMPT_TEMPLATE),
+        (AnswerType.SHORT, SHORT_ANSWER_PROMPT_TEMPLATE),
+        (AnswerType.LONG, LONG_ANSWER_PROMPT_TEMPLATE),
+    )
+}
+_DIRECT_PROMPT_PARTS = DIRECT_ANSWER_PROMPT_TEMPLATE.split("{query}")
+
+
+def classify_query(query: str) -> Literal["simple", "complex"]:
+    """
+    Classify a query as "simple" when it can be answered without any research,
+    such as plain arithmetic, and "complex" otherwise.
+    """
+    query = query.strip()
+    if (
+        _ARITHMETIC_QUERY_RE.fullmatch(query)
+        and _BINARY_OPERATION_RE.search(query)
+        and not _DATE_OR_PHONE_RE.search(query)
+    ):
+        return "simple"
+    return "complex"
+
+
+def _is_transient_error(error: BaseException) -> bool:
+    """
+    Check whether an error, or any error it was raised from, is a rate limit,
+    timeout, connection or server error that is worth retrying.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(
+            error,
+            (
+                openai.RateLimitError,
+                openai.APIConnectionError,
+                openai.InternalServerError,
+                requests.ConnectionError,
+                requests.Timeout,
+            ),
+        ):
+            return True
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            status_code = error.response.status_code
+            if status_code == 429 or status_code >= 500:
+                return True
+        error = error.__cause__ or error.__context__
+    return False
 
 
 class DeepResearchAgent(weave.Model):
@@ -65,18 +157,44 @@ class DeepResearchAgent(weave.Model):
     _model: Model
     _tool_calling_agent: MultiStepAgent
     _manager_agent: MultiStepAgent
+    _worker_agents: threading.local
+    _semantic_cache: SemanticCache | None = None
+    _response_cache: DiskCache | None = None
 
     def model_post_init(self, context: Any, /) -> None:
-        self._tools = [
-            SerperSearchTool(),
-            Crawl4AIFetchTool(),
-            JinaFetchTool(),
-            TheSportsDBSearchTool(),
-            SemanticScholarPaperSearchTool(),
-            SemanticScholarSnippetSearchTool(),
-            CodeExecutionTool(),
-            PubMedSearchTool(),
-        ]
+        # Sorted by name so the rendered tool list, and with it the system
+        # prompt prefix, is byte-identical across runs for provider prompt caching
+        def tool_cache(name: str) -> DiskCache | None:
+            # Without a disk cache the tools keep their own in-memory cache
+            if not self.config.enable_disk_cache:
+                return None
+            return DiskCache(
+                os.path.join(self.config.cache_dir, f"{name}.sqlite"), ttl=24 * 3600
+            )
+
+        self._tools = sorted(
+            [
+                SerperSearchTool(cache=tool_cache("serper")),
+                Crawl4AIFetchTool(cache=tool_cache("crawl4ai")),
+                JinaFetchTool(cache=tool_cache("jina")),
+                TheSportsDBSearchTool(),
+                SemanticScholarPaperSearchTool(),
+                SemanticScholarSnippetSearchTool(),
+                CodeExecutionTool(),
+                PubMedSearchTool(cache=tool_cache("pubmed")),
+            ],
+            key=lambda tool: tool.name,
+        )
+        llm_cache = None
+        if self.config.enable_llm_cache:
+            llm_cache = (
+                DiskCache(
+                    os.path.join(self.config.cache_dir, "llm.sqlite"),
+                    ttl=self.config.cache_ttl,
+                )
+                if self.config.enable_disk_cache
+                else TTLCache(max_size=512, ttl=3600)
+            )
         self._model = OpenAIModelWithThinkingTraces(
             model_id=self.config.model_name,
             api_base=self.config.base_url,
@@ -84,8 +202,27 @@ class DeepResearchAgent(weave.Model):
             max_tokens=self.config.max_tokens,
             temperature=self.config.temperature,
             extra_body={"reasoning": {"enabled": True}},
+            prompt_cache_control=self.config.prompt_cache_control,
+            response_cache=llm_cache,
         )
-        self._tool_calling_agent = TokenLimitedToolCallingAgent(
+        self._tool_calling_agent = self._build_tool_calling_agent()
+        self._worker_agents = threading.local()
+        if self.config.enable_semantic_cache:
+            self._semantic_cache = SemanticCache(
+                threshold=self.config.semantic_cache_threshold,
+                ttl=3600,
+                max_size=4096,
+            )
+        if self.config.enable_response_cache:
+            self._response_cache = DiskCache(
+                os.path.join(self.config.cache_dir, "responses.sqlite"),
+                ttl=self.config.cache_ttl,
+            )
+
+    def _build_tool_calling_agent(
+        self, logger: AgentLogger | None = None
+    ) -> TokenLimitedToolCallingAgent:
+        agent = TokenLimitedToolCallingAgent(
             model=self._model,
             tools=self._tools,
             max_steps=self.config.agent_max_steps,
@@ -95,47 +232,48 @@ class DeepResearchAgent(weave.Model):
             name=self.config.agent_name,
             description=TOOL_CALLING_AGENT_DESCRIPTION,
             provide_run_summary=True,
-            final_answer_checks=[increment_web_agent_token_counts],
             max_tool_threads=self.config.max_tool_threads,
+            memory_window=self.config.memory_window,
+            uncached_tools=[CodeExecutionTool.name],
         )
+        if logger is not None:
+            agent.logger = logger
+            agent.monitor.logger = logger
+        return agent
+
+    def _current_agent(self) -> MultiStepAgent:
+        """
+        Return the tool-calling agent of the current generate_sft_traces worker
+        thread, or the shared agent outside of it. Agents keep their memory on
+        the instance, so concurrent runs must never share one.
+        """
+        return getattr(self._worker_agents, "agent", self._tool_calling_agent)
 
-    @weave.op
     def postprocess_final_result(
         self, final_result: str, answer_type: AnswerType
     ) -> str:
-        final_result = re.sub(
-            r"<thinking>.*?</thinking>", "", final_result, flags=re.DOTALL
-        )
-        final_result = (
-            final_result
-            if not "<answer>" in final_result
-            else final_result.split("<answer>")[1].split("</answer>")[0].strip()
-        )
-        return final_result
+        if "<thinking>" in final_result:
+            final_result = _THINKING_RE.sub("", final_result)
+        _, found, answer = final_result.partition("<answer>")
+        if not found:
+            return final_result
+        # The answer runs until its closing tag or the next opening tag
+        answer = answer.partition("<answer>")[0].partition("</answer>")[0]
+        return answer.strip()
 
     @weave.op
     def _extract_citations_from_observations(self, observations: str) -> dict:
         """Extract snippet IDs and URLs from tool observations."""
         # Extract snippet IDs (e.g., [serper_1], [s2_paper_1], [pubmed_1], etc.)
-        snippet_ids = re.findall(r"\[([^\]]+)\]", observations)
-        # Filter to only include valid snippet IDs (not markdown links or other brackets)
-        valid_prefixes = (
-            "serper_",
-            "s2_paper_",
-            "s2_snippet_",
-            "pubmed_",
-            "crawl4ai_",
-            "jina_",
-            "sportsdb_",
-        )
-        snippet_ids = [
-            sid
-            for sid in snippet_ids
-            if any(sid.startswith(prefix) for prefix in valid_prefixes)
-        ]
-
-        # Extract URLs
-        urls = re.findall(r"URL: (https?://[^\s\n]+)", observations)
+        # and URLs in a single pass
+        snippet_ids = []
+        urls = []
+        for match in _OBSERVATION_CITATION_RE.finditer(observations):
+            snippet_id, url = match.group("snippet_id", "url")
+            if snippet_id is not None:
+                snippet_ids.append(snippet_id)
+            else:
+                urls.append(url)
 
         return {
             "snippet_ids": snippet_ids,
@@ -145,105 +283,224 @@ class DeepResearchAgent(weave.Model):
     @weave.op
     def _extract_citations_from_answer(self, answer: str) -> list:
         """Extract cited IDs from the final answer using <cite id="..."> format."""
+        # Most exact answers carry no citations, so skip the regex scan entirely
+        if "<cite" not in answer:
+            return []
         # Match <cite id="id1,id2">...</cite> patterns
         cited_ids = []
-        cite_patterns = re.findall(r'<cite id="([^"]+)">', answer)
+        cite_patterns = _CITE_RE.findall(answer)
         for pattern in cite_patterns:
             # Handle comma-separated IDs
             ids = [id.strip() for id in pattern.split(",")]
             cited_ids.extend(ids)
         return cited_ids
 
-    @weave.op
-    def predict(self, query: str, answer_type: AnswerType) -> Tuple[str, list]:
-        if answer_type == AnswerType.EXACT:
-            query = EXACT_ANSWER_PROMPT_TEMPLATE.format(query=query)
-        elif answer_type == AnswerType.SHORT:
-            query = SHORT_ANSWER_PROMPT_TEMPLATE.format(query=query)
-        elif answer_type == AnswerType.LONG:
-            query = LONG_ANSWER_PROMPT_TEMPLATE.format(query=query)
-        final_result = self._tool_calling_agent.run(query)
-        agent_memory = self._tool_calling_agent.write_memory_to_messages()
-        trace = []
-        for step in agent_memory:
-            trace.append(
+    def _answer_directly(self, query: str, answer_type: AnswerType) -> dict:
+        """
+        Answer a raw query with a single model call, skipping the tool-calling
+        loop. The research templates ask the model to search, which it can't
+        do here, so the query only gets the answer format instructions.
+        """
+        prefix, suffix = _DIRECT_PROMPT_PARTS
+        agent_memory = [
+            ChatMessage(
+                role=MessageRole.USER,
+                content=[{"type": "text", "text": prefix + query + suffix}],
+            )
+        ]
+        response = self._model.generate(agent_memory)
+        final_result = response.content or ""
+        agent_memory.append(
+            ChatMessage(
+                role=MessageRole.ASSISTANT,
+                content=[{"type": "text", "text": final_result}],
+            )
+        )
+        token_usage_per_step = []
+        total_input_tokens = total_output_tokens = total_cached_tokens = 0
+        token_usage = response.token_usage
+        if token_usage:
+            cached_tokens = getattr(token_usage, "cached_tokens", 0)
+            total_input_tokens = token_usage.input_tokens
+            total_output_tokens = token_usage.output_tokens
+            total_cached_tokens = cached_tokens
+            token_usage_per_step.append(
                 {
-                    "role": step.role,
-                    "content": step.content[0]["text"],
+                    "step_number": 1,
+                    "input_tokens": token_usage.input_tokens,
+                    "output_tokens": token_usage.output_tokens,
+                    "total_tokens": token_usage.total_tokens,
+                    "cached_tokens": cached_tokens,
+                    "prefix_reuse_ratio": (
+                        cached_tokens / token_usage.input_tokens
+                        if token_usage.input_tokens
+                        else 0.0
+                    ),
                 }
             )
+        cited_ids_in_answer = self._extract_citations_from_answer(final_result)
+        return {
+            "final_result": self.postprocess_final_result(final_result, answer_type),
+            "agent_memory": agent_memory,
+            "trace": [
+                {"role": message.role, "content": message.content[0]["text"]}
+                for message in agent_memory
+            ],
+            "total_tool_calls": 0,
+            "tool_calls": [],
+            "tool_calling_errors": 0,
+            "token_usage_per_step": token_usage_per_step,
+            "total_input_tokens": total_input_tokens,
+            "total_output_tokens": total_output_tokens,
+            "total_cached_tokens": total_cached_tokens,
+            "available_snippet_ids": [],
+            "urls_used": [],
+            "cited_ids_in_answer": cited_ids_in_answer,
+            "citations_used": [
+                {"id": cited_id, **_UNKNOWN_CITATION_SOURCE}
+                for cited_id in cited_ids_in_answer
+            ],
+            "snippet_id_to_source": {},
+        }
+
+    @weave.op
+    def predict(self, query: str, answer_type: AnswerType) -> Tuple[str, list]:
+        answer_directly = (
+            self.config.enable_query_routing and classify_query(query) == "simple"
+        )
+        # The templates wrap every question in the same long instructions, so
+        # the semantic cache compares the raw question to keep its embedding
+        # from being dominated by the shared boilerplate
+        raw_query = query
+        prefix, suffix = _PROMPT_PARTS[answer_type]
+        query = prefix + query + suffix
+        if self._response_cache is not None:
+            cache_key = make_key(
+                q=query,
+                type=answer_type.value,
+                model=self.config.model_name,
+                temperature=self.config.temperature,
+            )
+            cached_result = self._response_cache.get(cache_key)
+            if cached_result is not None:
+                return cached_result
+        if self._semantic_cache is not None:
+            cached_result = self._semantic_cache.get(answer_type.value, raw_query)
+            if cached_result is not None:
+                return cached_result
+        if answer_directly:
+            result = self._answer_directly(raw_query, answer_type)
+        else:
+            result = self._run_agent(query, answer_type)
+        if self._semantic_cache is not None:
+            self._semantic_cache.put(answer_type.value, raw_query, result)
+        if self._response_cache is not None:
+            self._response_cache.set(cache_key, result)
+        return result
+
+    def _run_agent(self, query: str, answer_type: AnswerType) -> dict:
+        """Run the tool-calling agent on a formatted query and collect its trace."""
+        agent = self._current_agent()
+        final_result = agent.run(query)
+        agent_memory = agent.write_memory_to_messages(full_history=True)
+        trace = [
+            {"role": step.role, "content": step.content[0]["text"]}
+            for step in agent_memory
+        ]
         tool_calls = []
         token_usage_per_step = []
+        total_input_tokens = total_output_tokens = total_cached_tokens = 0
         tool_calling_errors = 0
 
         # Track citations and sources
-        all_snippet_ids = []
-        all_urls = set()
+        all_urls = {}  # Insertion-ordered so traces list URLs deterministically
         snippet_id_to_source = {}  # Map snippet IDs to their source tools
 
-        for step in self._tool_calling_agent.memory.steps:
-            if isinstance(step, ActionStep):
-                if step.tool_calls:
-                    # Exclude final_answer tool calls if you only want actual tool usage
-                    for tool_call in step.tool_calls:
-                        if tool_call.name != "final_answer":
-                            tool_calls.append(tool_call.name)
-
-                            # Extract citations from tool observations
-                            if step.observations:
-                                obs_text = str(step.observations)
-                                extracted = self._extract_citations_from_observations(
-                                    obs_text
-                                )
-
-                                # Map snippet IDs to their source tool
-                                for snippet_id in extracted["snippet_ids"]:
-                                    if snippet_id not in snippet_id_to_source:
-                                        snippet_id_to_source[snippet_id] = {
-                                            "tool": tool_call.name,
-                                            "step": step.step_number,
-                                        }
-                                        all_snippet_ids.append(snippet_id)
-
-                                # Collect URLs
-                                all_urls.update(extracted["urls"])
-
-                # Count tool calling errors
-                if step.error is not None:
-                    tool_calling_errors += 1
-
-                # Collect token usage for this step
-                if step.token_usage:
-                    token_usage_per_step.append(
-                        {
-                            "step_number": step.step_number,
-                            "input_tokens": step.token_usage.input_tokens,
-                            "output_tokens": step.token_usage.output_tokens,
-                            "total_tokens": step.token_usage.total_tokens,
+        for step in agent.memory.steps:
+            if not isinstance(step, ActionStep):
+                continue
+
+            # Exclude final_answer tool calls if you only want actual tool usage
+            step_tool_calls = [
+                tool_call.name
+                for tool_call in step.tool_calls or ()
+                if tool_call.name != "final_answer"
+            ]
+            tool_calls.extend(step_tool_calls)
+
+            # Extract citations from tool observations. The observations of a
+            # step are shared by all of its tool calls, so they are scanned once
+            # and new snippet IDs are attributed to the step's first tool call.
+            if step_tool_calls and step.observations:
+                extracted = self._extract_citations_from_observations(
+                    str(step.observations)
+                )
+
+                # Map snippet IDs to their source tool
+                for snippet_id in extracted["snippet_ids"]:
+                    if snippet_id not in snippet_id_to_source:
+                        snippet_id_to_source[snippet_id] = {
+                            "tool": step_tool_calls[0],
+                            "step": step.step_number,
                         }
-                    )
+
+                # Collect URLs
+                all_urls.update(dict.fromkeys(extracted["urls"]))
+
+            # Count tool calling errors
+            if step.error is not None:
+                tool_calling_errors += 1
+
+            # Collect token usage for this step
+            token_usage = step.token_usage
+            if token_usage:
+                # Only set when the provider reports prompt-cache hits
+                cached_tokens = getattr(token_usage, "cached_tokens", 0)
+                total_input_tokens += token_usage.input_tokens
+                total_output_tokens += token_usage.output_tokens
+                total_cached_tokens += cached_tokens
+                token_usage_per_step.append(
+                    {
+                        "step_number": step.step_number,
+                        "input_tokens": token_usage.input_tokens,
+                        "output_tokens": token_usage.output_tokens,
+                        "total_tokens": token_usage.total_tokens,
+                        "cached_tokens": cached_tokens,
+                        "prefix_reuse_ratio": (
+                            cached_tokens / token_usage.input_tokens
+                            if token_usage.input_tokens
+                            else 0.0
+                        ),
+                    }
+                )
+
+        # Memory summary calls happen between steps and are not recorded on them
+        summary_token_usage = []
+        for token_usage in agent.summary_token_usage:
+            cached_tokens = getattr(token_usage, "cached_tokens", 0)
+            total_input_tokens += token_usage.input_tokens
+            total_output_tokens += token_usage.output_tokens
+            total_cached_tokens += cached_tokens
+            summary_token_usage.append(
+                {
+                    "input_tokens": token_usage.input_tokens,
+                    "output_tokens": token_usage.output_tokens,
+                    "total_tokens": token_usage.total_tokens,
+                    "cached_tokens": cached_tokens,
+                }
+            )
 
         # Extract citations used in the final answer
         cited_ids_in_answer = self._extract_citations_from_answer(final_result)
 
         # Build citation metadata for IDs actually used in the answer
-        citations_used = []
-        for cited_id in cited_ids_in_answer:
-            if cited_id in snippet_id_to_source:
-                citations_used.append(
-                    {
-                        "id": cited_id,
-                        **snippet_id_to_source[cited_id],
-                    }
-                )
-            else:
-                citations_used.append(
-                    {
-                        "id": cited_id,
-                        "tool": "unknown",
-                        "step": None,
-                    }
-                )
+        citations_used = [
+            {
+                "id": cited_id,
+                **snippet_id_to_source.get(cited_id, _UNKNOWN_CITATION_SOURCE),
+            }
+            for cited_id in cited_ids_in_answer
+        ]
 
         return {
             "final_result": self.postprocess_final_result(final_result, answer_type),
@@ -253,8 +510,12 @@ class DeepResearchAgent(weave.Model):
             "tool_calls": tool_calls,
             "tool_calling_errors": tool_calling_errors,
             "token_usage_per_step": token_usage_per_step,
+            "summary_token_usage": summary_token_usage,
+            "total_input_tokens": total_input_tokens,
+            "total_output_tokens": total_output_tokens,
+            "total_cached_tokens": total_cached_tokens,
             # New citation-related fields
-            "available_snippet_ids": all_snippet_ids,
+            "available_snippet_ids": list(snippet_id_to_source),
             "urls_used": list(all_urls),
             "cited_ids_in_answer": cited_ids_in_answer,
             "citations_used": citations_used,
@@ -264,47 +525,92 @@ class DeepResearchAgent(weave.Model):
     @weave.op
     def generate_sft_traces(
         self,
-        dataset: Dataset,
+        dataset: "Dataset",
         answer_type: AnswerType,
         prompt_column: str,
         answer_column: str,
         dataset_name: str | None = None,
         min_index: int | None = None,
         max_index: int | None = None,
+        output_path: str | None = None,
     ) -> list[dict]:
+        """
+        Run the agent over every prompt in the dataset and collect the traces.
+
+        Completed traces are appended to a JSONL file as they finish. When
+        output_path points to an existing file, prompts already recorded there
+        are skipped so an interrupted run can be resumed.
+
+        Raises RuntimeError, without pushing to the hub, when too many data
+        points fail; the traces that completed are kept in the JSONL file.
+        """
+        # Only needed for trace generation, so keep them off the import path
+        from datasets import Dataset
+        from rich.progress import (
+            BarColumn,
+            Progress,
+            SpinnerColumn,
+            TaskProgressColumn,
+            TextColumn,
+            TimeElapsedColumn,
+        )
+
         if min_index is not None or max_index is not None:
             start = min_index if min_index is not None else 0
             end = max_index if max_index is not None else len(dataset)
             dataset = dataset.select(range(start, end))
-        else:
-            dataset = dataset
+        total = len(dataset)
+
+        remove_output = output_path is None
+        if output_path is None:
+            fd, output_path = tempfile.mkstemp(suffix=".jsonl")
+            os.close(fd)
+        completed_prompts = set()
+        if os.path.exists(output_path):
+            with open(output_path, encoding="utf-8") as fh:
+                for line in fh:
+                    if line.strip():
+                        completed_prompts.add(json_loads(line)["prompt"])
+        if completed_prompts:
+            dataset = dataset.filter(
+                lambda prompt: prompt not in completed_prompts,
+                input_columns=prompt_column,
+            )
+        # Only the prompt and answer columns are read, so iterate over those two
+        # columns directly instead of materializing a dict for every row.
+        rows = zip(dataset[prompt_column], dataset[answer_column])
         silent_logger = AgentLogger(level=0)
-        self._tool_calling_agent.logger = silent_logger
-        self._tool_calling_agent.monitor.logger = silent_logger
-        data_points = []
 
-        def process_data_point(data_point):
-            try:
-                result = self.predict(
-                    data_point[prompt_column], answer_type=answer_type
-                )
-                # Calculate total input and output tokens across all steps
-                total_input_tokens = sum(
-                    step["input_tokens"] for step in result["token_usage_per_step"]
-                )
-                total_output_tokens = sum(
-                    step["output_tokens"] for step in result["token_usage_per_step"]
-                )
+        def init_worker():
+            # Each worker thread runs its own agent so memories never interleave
+            self._worker_agents.agent = self._build_tool_calling_agent(
+                logger=silent_logger
+            )
+
+        # Agent errors wrap the underlying API error, so retries look at the
+        # whole exception chain to find rate limits and server errors
+        @retry(
+            retry=retry_if_exception(_is_transient_error),
+            wait=wait_random_exponential(multiplier=1, max=30),
+            stop=stop_after_attempt(5),
+            reraise=True,
+        )
+        def predict_with_retries(prompt: str) -> dict:
+            return self.predict(prompt, answer_type=answer_type)
 
+        def process_data_point(prompt: str, answer: Any):
+            try:
+                result = predict_with_retries(prompt)
                 return {
-                    "prompt": data_point[prompt_column],
-                    "original_answer": data_point[answer_column],
+                    "prompt": prompt,
+                    "original_answer": answer,
                     "answer": result["final_result"],
                     "conversations": result["trace"],
                     "tool_calls": result["tool_calls"],
                     "total_tool_calls": result["total_tool_calls"],
-                    "total_input_tokens": total_input_tokens,
-                    "total_output_tokens": total_output_tokens,
+                    "total_input_tokens": result["total_input_tokens"],
+                    "total_output_tokens": result["total_output_tokens"],
+                    "total_cached_tokens": result["total_cached_tokens"],
                     "tool_calling_errors": result["tool_calling_errors"],
                     # Include citation data
                     "urls_used": result["urls_used"],
@@ -312,7 +618,15 @@ class DeepResearchAgent(weave.Model):
                     "citations_used": result["citations_used"],
                 }
             except Exception as e:
-                return None
+                # Report the innermost error so failures are bucketed by their
+                # actual cause rather than by the agent's wrapper exception
+                while e.__cause__ is not None:
+                    e = e.__cause__
+                return {
+                    "prompt": prompt,
+                    "error_type": type(e).__name__,
+                    "error": repr(e),
+                }
 
         with Progress(
             SpinnerColumn(),
@@ -321,24 +635,95 @@ class DeepResearchAgent(weave.Model):
             TaskProgressColumn(),
             TimeElapsedColumn(),
         ) as progress:
-            task = progress.add_task("Generating SFT Traces", total=len(dataset))
-
-            with ThreadPoolExecutor(
-                max_workers=self.config.max_agent_workers
-            ) as executor:
-                futures = {
-                    executor.submit(process_data_point, data_point): data_point
-                    for data_point in dataset
+            task = progress.add_task(
+                "Generating SFT Traces",
+                total=total,
+                completed=total - len(dataset),
+            )
+
+            with (
+                ThreadPoolExecutor(
+                    max_workers=self.config.max_agent_workers, initializer=init_worker
+                ) as executor,
+                open(output_path, "a", encoding="utf-8", buffering=1) as output_file,
+            ):
+                # Keep at most two jobs per worker in flight so pending rows and
+                # their partial results don't pile up for large datasets.
+                pending = {
+                    executor.submit(process_data_point, prompt, answer)
+                    for prompt, answer in itertools.islice(
+                        rows, self.config.max_agent_workers * 2
+                    )
                 }
 
-                for future in as_completed(futures):
-                    result = future.result()
-                    if result is not None:
-                        data_points.append(result)
-                    progress.update(task, advance=1)
+                completed = 0
+                failures = Counter()
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        result = future.result()
+                        completed += 1
+                        if "error_type" in result:
+                            failures[result["error_type"]] += 1
+                            logger.warning(
+                                "Dropping data point %r: %s",
+                                result["prompt"][:80],
+                                result["error"],
+                            )
+                        else:
+                            output_file.write(json_dumps(result) + "\n")
+                        progress.update(task, advance=1)
+
+                        if rows is None:
+                            continue
+                        # Stop feeding new rows once most of them fail, e.g. when
+                        # a backend is down, instead of running every remaining
+                        # row into the same error
+                        failed = sum(failures.values())
+                        if (
+                            completed >= self.config.failure_rate_min_samples
+                            and failed / completed > self.config.max_failure_rate
+                        ):
+                            logger.error(
+                                "Stopping after %d of %d data points failed: %s",
+                                failed,
+                                completed,
+                                dict(failures),
+                            )
+                            rows = None
+                            continue
+                        for prompt, answer in itertools.islice(rows, 1):
+                            pending.add(
+                                executor.submit(process_data_point, prompt, answer)
+                            )
+
+                if failures:
+                    logger.warning(
+                        "Failed data points by error type: %s", dict(failures)
+                    )
+
+        # rows is only cleared by the failure-rate cutoff. Keep the traces that
+        # did complete so the run can be resumed, and don't publish a partial
+        # dataset
+        if rows is None:
+            raise RuntimeError(
+                f"Stopped generating traces after {sum(failures.values())} of "
+                f"{completed} data points failed ({dict(failures)}); completed "
+                f"traces are in {output_path}, pass it as output_path to resume"
+            )
+
+        if os.path.getsize(output_path) > 0:
+            traces = Dataset.from_json(output_path)
+        else:
+            traces = Dataset.from_list([])
+        if remove_output:
+            os.remove(output_path)
 
         if dataset_name:
-            dataset = Dataset.from_list(data_points)
-            dataset.push_to_hub(dataset_name)
+            traces.push_to_hub(
+                dataset_name,
+                max_shard_size="500MB",
+                num_proc=os.cpu_count(),
+            )
 
-        return data_points
+        return traces.to_list()
@@ -1,15 +1,283 @@
+import ast
+import copy
 import json
+import logging
 import re
-import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import Any
+from xml.sax.saxutils import unescape
 
 import weave
+from openai.types.chat import ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
 from smolagents import ChatMessage, OpenAIModel, TokenUsage
 from smolagents.models import remove_content_after_stop_sequences
 from smolagents.tools import Tool
 
+from athena_dr.agent.cache import DiskCache, TTLCache, make_key
+from athena_dr.utils import json_dumps, json_loads
+
+logger = logging.getLogger(__name__)
+
+# Tool-call parser patterns, compiled once at import instead of on every
+# model response
+_TOOL_CALL_RE = re.compile(
+    r"<tool_call>(.*?)(?:</tool_call>|\}(?=\s*(?:<|$|Error)))", re.DOTALL
+)
+_TOOL_NAME_RE = re.compile(r"^([a-zA-Z_][a-zA-Z0-9_]*)")
+_HYBRID_KV_RE = re.compile(r'"(\w+)"\s*:\s*(?:"([^"]*)"|([\d.]+))')
+_TOOL_NAME_TAG_RE = re.compile(r"<tool_name>(.*?)</tool_name>")
+_BRACKET_RE = re.compile(r"\[TOOL_CALL\](.*?)\[/TOOL_CALL\]", re.DOTALL)
+_ARROW_TOOL_RE = re.compile(r'\{\s*tool\s*=>\s*"([^"]+)"')
+_ARROW_ARGS_RE = re.compile(r"args\s*=>\s*(?=\{)")
+_QUOTED_ARGS_RE = re.compile(r"['\"]args['\"]\s*:\s*\{([^}]*)\}", re.DOTALL)
+_QUOTED_KV_RE = re.compile(r"['\"](\w+)['\"]\s*:\s*(?:['\"]([^'\"]*)['\"]|(\d+))")
+_ACTION_NAME_RE = re.compile(r'"name"\s*:\s*"([^"]+)"')
+_ACTION_ARGS_RE = re.compile(r'"arguments"\s*:\s*\{([^}]*)\}', re.DOTALL)
+_ACTION_KV_RE = re.compile(r'"(\w+)"\s*:\s*(?:"([^"]*)"|([\d.]+)|(\w+))')
+_EMPTY_CITE_RE = re.compile(r"<cite\s+id=['\"][^'\"]*['\"]\s*>\s*</cite>\s*---?")
+_EVENT_RE = re.compile(r"\[Event:\s*(\{[^]]*\})\s*\]", re.DOTALL)
+_INVOKE_RE = re.compile(r"<invoke>(.*?)</invoke>", re.DOTALL)
+_XML_ELEMENT_RE = re.compile(r"<([a-zA-Z_][a-zA-Z0-9_]*)>(.*?)</\1>", re.DOTALL)
+
+# search_type values used in [Event: {...}] tool calls, mapped to tool names
+_TOOL_NAME_MAP = {
+    "scholarly_search": "semantic_scholar_paper_search",
+    "web_search": "serper_search_tool",
+}
+
+# Start marker of every supported tool-call format
+_TOOL_CALL_MARKERS = ("<tool_call>", "<invoke>", "[TOOL_CALL]", "Action:", "[Event:")
+# Any of the markers, so a response is scanned once however many formats it
+# mixes
+_BLOCK_START_RE = re.compile("|".join(map(re.escape, _TOOL_CALL_MARKERS)))
+# Pattern matching the whole block that starts at each marker; Action blocks
+# are delimited with _find_matching_brace instead
+_BLOCK_PATTERNS = {
+    "<tool_call>": _TOOL_CALL_RE,
+    "<invoke>": _INVOKE_RE,
+    "[TOOL_CALL]": _BRACKET_RE,
+    "[Event:": _EVENT_RE,
+}
+
+
+def _find_matching_brace(s: str, start: int, quotes: str = "\"'") -> int:
+    """Return the index of the `}` closing the `{` at `s[start]`, or -1.
+
+    Scans once, tracking nesting depth and skipping over braces inside string
+    literals delimited by any character in `quotes`. Unlike a nested-brace
+    regex this never backtracks, whatever the model produced.
+    """
+    depth = 0
+    quote = None
+    i = start
+    n = len(s)
+    while i < n:
+        char = s[i]
+        if quote:
+            if char == "\\":
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in quotes:
+            quote = char
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return -1
+
+
+def _find_field_value(block: str, field: str) -> int:
+    """Return the index where the value of the 'field' or "field" key starts.
+
+    Returns -1 when the key, followed by a colon, is not in block.
+    """
+    for quote in "'\"":
+        key = f"{quote}{field}{quote}"
+        pos = block.find(key)
+        while pos != -1:
+            i = pos + len(key)
+            while i < len(block) and block[i].isspace():
+                i += 1
+            if block.startswith(":", i):
+                i += 1
+                while i < len(block) and block[i].isspace():
+                    i += 1
+                return i
+            pos = block.find(key, pos + 1)
+    return -1
+
+
+def _extract_quoted_field(block: str, field: str) -> str | None:
+    """Return the quoted or bare string value of the field key in block."""
+    start = _find_field_value(block, field)
+    if start == -1 or start == len(block):
+        return None
+    if block[start] in "'\"":
+        end = block.find(block[start], start + 1)
+        if end == -1:
+            return None
+        return block[start + 1 : end] or None
+    end = start
+    while end < len(block) and block[end] not in ",}" and not block[end].isspace():
+        end += 1
+    return block[start:end] or None
+
+
+def _to_int(value: str) -> int | str:
+    """Return value as an int if it is an integer literal, else unchanged."""
+    # int() also accepts digit separators, which are never meant as such in
+    # model output (e.g. "2020_2025")
+    if "_" in value:
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def _to_number(value: str) -> int | float | str:
+    """Return value as an int or float if it parses as one, else unchanged."""
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def _parse_cli_args(args_content: str) -> dict[str, Any]:
+    """Parse CLI-style arguments: --param value or --param "value".
+
+    A single left-to-right scan; a flag whose name is not directly followed by
+    whitespace and a value is ignored.
+    """
+    arguments = {}
+    n = len(args_content)
+    pos = args_content.find("--")
+    while pos != -1:
+        name_end = pos + 2
+        while name_end < n and (
+            args_content[name_end].isalnum() or args_content[name_end] == "_"
+        ):
+            name_end += 1
+        value_start = name_end
+        while value_start < n and args_content[value_start].isspace():
+            value_start += 1
+        if name_end == pos + 2 or value_start == name_end or value_start == n:
+            pos = args_content.find("--", pos + 1)
+            continue
+
+        close = -1
+        if args_content[value_start] == '"':
+            close = args_content.find('"', value_start + 1)
+        if close != -1:
+            value = args_content[value_start + 1 : close]
+            value_end = close + 1
+        else:
+            value_end = value_start
+            while value_end < n and not args_content[value_end].isspace():
+                value_end += 1
+            value = args_content[value_start:value_end]
+
+        arguments[args_content[pos + 2 : name_end]] = _to_int(value)
+        pos = args_content.find("--", value_end)
+    return arguments
+
+
+def _make_tool_call(
+    idx: int, name: str, arguments: str
+) -> ChatCompletionMessageToolCall:
+    """Build a function tool call in the format expected by smolagents.
+
+    The fields come straight from the parser, so pydantic validation is skipped.
+    """
+    return ChatCompletionMessageToolCall.model_construct(
+        id=f"call_{idx}",
+        type="function",
+        function=Function.model_construct(name=name, arguments=arguments),
+    )
+
+
+def _iter_xml_elements(text: str):
+    """Yield (tag, inner_text) for each top-level <tag>...</tag> element.
+
+    A find-based scan in place of a backreferencing regex: each opening tag
+    costs one search for its closing tag, and an element with no closing tag
+    is skipped. Values may span several lines.
+    """
+    # Tags whose closing tag is missing from the rest of the text, so repeated
+    # unclosed tags are searched for only once
+    unclosed = set()
+    pos = text.find("<")
+    while pos != -1:
+        tag_end = text.find(">", pos + 1)
+        if tag_end == -1:
+            return
+        tag = text[pos + 1 : tag_end]
+        if tag and "/" not in tag and tag not in unclosed:
+            closing = f"</{tag}>"
+            end = text.find(closing, tag_end + 1)
+            if end != -1:
+                yield tag, text[tag_end + 1 : end]
+                pos = text.find("<", end + len(closing))
+                continue
+            unclosed.add(tag)
+        pos = text.find("<", pos + 1)
+
+
+def _strip_spans(content: str, spans: list[tuple[int, int]]) -> str:
+    """Remove the given (start, end) spans, sorted by start, from content.
+
+    Overlapping spans are merged, so the result is built in a single pass.
+    """
+    parts = []
+    prev = 0
+    for start, end in spans:
+        if start > prev:
+            parts.append(content[prev:start])
+        prev = max(prev, end)
+    parts.append(content[prev:])
+    return "".join(parts)
+
+
+@dataclass
+class TokenUsageWithCache(TokenUsage):
+    """TokenUsage that also records how many input tokens were served from the
+    provider's prompt cache."""
+
+    cached_tokens: int = 0
+
 
 class OpenAIModelWithThinkingTraces(OpenAIModel):
+    def __init__(
+        self,
+        *args,
+        prompt_cache_control: bool = False,
+        response_cache: TTLCache | DiskCache | None = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.prompt_cache_control = prompt_cache_control
+        # Responses keyed by the exact completion request; None disables it
+        self.response_cache = response_cache
+        # Completion arguments that are the same for every generate call
+        self._static_completion_kwargs = {
+            "model": self.model_id,
+            "custom_role_conversions": self.custom_role_conversions,
+            "convert_images_to_image_urls": True,
+        }
+        # Scanning is a pure function of the content, so identical responses
+        # (e.g. a repeated turn) are only parsed once
+        self._scan_tool_calls_cached = lru_cache(maxsize=1024)(self._scan_tool_calls)
+
     def _prepare_completion_kwargs(
         self,
         messages: list[ChatMessage | dict],
@@ -28,137 +296,107 @@ class OpenAIModelWithThinkingTraces(OpenAIModel):
         )
         # Store tools for reference but don't send them in the request
         self._current_tools = tools_to_call_from
+        if self.prompt_cache_control:
+            self._mark_static_prefix(completion_kwargs["messages"])
         return completion_kwargs
 
-    def _parse_xml_tool_calls(
-        self, content: str
-    ) -> tuple[str, list[dict[str, Any]] | None]:
-        """Parse XML-formatted tool calls and convert to OpenAI format.
+    @staticmethod
+    def _mark_static_prefix(messages: list[dict[str, Any]]) -> None:
+        """Mark the end of the system prompt as a prompt-cache breakpoint.
+
+        The system prompt is identical across every step and every query of a
+        run, so providers that need explicit breakpoints (Anthropic-style
+        `cache_control`) can reuse its KV cache instead of re-billing it.
+        """
+        if not messages or messages[0]["role"] != "system":
+            return
+        content = messages[0]["content"]
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        if not content:
+            return
+        # Copy rather than edit in place, the parts may be shared with the caller
+        content = [
+            *content[:-1],
+            {**content[-1], "cache_control": {"type": "ephemeral"}},
+        ]
+        messages[0] = {**messages[0], "content": content}
+
+    def _parse_xml_block(self, tool_call_xml: str) -> list[tuple[str, Any]]:
+        """Parse the body of one <tool_call> block.
 
         Supports multiple formats:
         1. <tool_call><tool_name>name</tool_name><arg>value</arg></tool_call>
         2. <tool_call>tool_name\n"arg": "value"...</tool_call> (hybrid format)
 
         Returns:
-            Tuple of (cleaned_content, tool_calls_list or None)
+            List of (tool_name, arguments) pairs, empty if nothing was parsed
         """
-        if not content or "<tool_call>" not in content:
-            return content, None
-
-        tool_calls = []
-        cleaned_content = content
-
-        # Extract all tool_call blocks (with or without closing tag)
-        # Some models don't close the tag properly
-        tool_call_pattern = r"<tool_call>(.*?)(?:</tool_call>|\}(?=\s*(?:<|$|Error)))"
-        matches = list(re.finditer(tool_call_pattern, content, re.DOTALL))
-
-        for idx, match in enumerate(matches):
-            tool_call_xml = match.group(1).strip()
-            tool_name = None
-            arguments = {}
-
-            try:
-                # Try Format 1: Standard XML with <tool_name> element
-                try:
-                    root = ET.fromstring(f"<root>{tool_call_xml}</root>")
-                    tool_name_elem = root.find("tool_name")
-                    if tool_name_elem is not None and tool_name_elem.text:
-                        tool_name = tool_name_elem.text.strip()
-                        for child in root:
-                            if child.tag != "tool_name" and child.text:
-                                arguments[child.tag] = child.text.strip()
-                except ET.ParseError:
-                    pass
-
-                # Try Format 2: Hybrid format - tool name as first line, then JSON-like args
-                # <tool_call>semantic_scholar_paper_search
-                #   "query": "value",
-                #   "limit": 10
-                # }
-                if tool_name is None:
-                    lines = tool_call_xml.split("\n")
-                    if lines:
-                        # First line should be the tool name
-                        first_line = lines[0].strip()
-                        # Remove any leading { if present
-                        if first_line.startswith("{"):
-                            first_line = first_line[1:].strip()
-                        # Tool name is alphanumeric with underscores
-                        tool_name_match = re.match(
-                            r"^([a-zA-Z_][a-zA-Z0-9_]*)", first_line
-                        )
-                        if tool_name_match:
-                            tool_name = tool_name_match.group(1)
-
-                            # Rest is JSON-like content
-                            rest_content = "\n".join(lines[1:])
-                            # Add opening brace if missing
-                            if "{" not in tool_call_xml or tool_call_xml.index(
-                                "{"
-                            ) > len(first_line):
-                                rest_content = "{" + rest_content
-                            # Ensure closing brace
-                            if not rest_content.rstrip().endswith("}"):
-                                rest_content = rest_content.rstrip() + "}"
-
-                            try:
-                                arguments = json.loads(rest_content)
-                            except json.JSONDecodeError:
-                                # Try to extract key-value pairs with regex
-                                kv_pattern = r'"(\w+)"\s*:\s*(?:"([^"]*)"|([\d.]+))'
-                                for kv in re.finditer(kv_pattern, rest_content):
-                                    key = kv.group(1)
-                                    if kv.group(2) is not None:
-                                        arguments[key] = kv.group(2)
-                                    elif kv.group(3) is not None:
-                                        val = kv.group(3)
-                                        arguments[key] = (
-                                            int(val) if val.isdigit() else float(val)
-                                        )
-
-                # Try Format 3: Simple regex extraction for <tool_name> tag
-                if tool_name is None:
-                    tool_name_match = re.search(
-                        r"<tool_name>(.*?)</tool_name>", tool_call_xml
-                    )
+        tool_name = None
+        arguments = {}
+
+        try:
+            # Try Format 1: <tool_name> element followed by one element per
+            # argument. Children are flat, so a plain tag scan is enough
+            tool_name_match = _TOOL_NAME_TAG_RE.search(tool_call_xml)
+            if tool_name_match:
+                tool_name = tool_name_match.group(1).strip()
+                for arg_name, arg_value in _iter_xml_elements(tool_call_xml):
+                    if arg_name == "tool_name":
+                        continue
+                    arg_value = arg_value.strip()
+                    # Decode the entities models escape in XML values
+                    if "&" in arg_value:
+                        arg_value = unescape(arg_value)
+                    arguments[arg_name] = arg_value
+
+            # Try Format 2: Hybrid format - tool name as first line, then JSON-like args
+            # <tool_call>semantic_scholar_paper_search
+            #   "query": "value",
+            #   "limit": 10
+            # }
+            if tool_name is None:
+                lines = tool_call_xml.split("\n")
+                if lines:
+                    # First line should be the tool name
+                    first_line = lines[0].strip()
+                    # Remove any leading { if present
+                    if first_line.startswith("{"):
+                        first_line = first_line[1:].strip()
+                    # Tool name is alphanumeric with underscores
+                    tool_name_match = _TOOL_NAME_RE.match(first_line)
                     if tool_name_match:
-                        tool_name = tool_name_match.group(1).strip()
-                        arg_pattern = r"<([^/>]+)>(.*?)</\1>"
-                        for arg_match in re.finditer(arg_pattern, tool_call_xml):
-                            arg_name = arg_match.group(1)
-                            if arg_name != "tool_name":
-                                arguments[arg_name] = arg_match.group(2).strip()
-
-                if tool_name:
-                    tool_call = {
-                        "id": f"call_{idx}",
-                        "type": "function",
-                        "function": {
-                            "name": tool_name,
-                            "arguments": json.dumps(arguments),
-                        },
-                    }
-                    tool_calls.append(tool_call)
-
-            except Exception:
-                continue
+                        tool_name = tool_name_match.group(1)
+
+                        # Rest is JSON-like content
+                        rest_content = "\n".join(lines[1:])
+                        # Add opening brace if missing
+                        if "{" not in tool_call_xml or tool_call_xml.index("{") > len(
+                            first_line
+                        ):
+                            rest_content = "{" + rest_content
+                        # Ensure closing brace
+                        if not rest_content.rstrip().endswith("}"):
+                            rest_content = rest_content.rstrip() + "}"
+
+                        try:
+                            arguments = json_loads(rest_content)
+                        except json.JSONDecodeError:
+                            # Try to extract key-value pairs with regex
+                            for kv in _HYBRID_KV_RE.finditer(rest_content):
+                                key = kv.group(1)
+                                if kv.group(2) is not None:
+                                    arguments[key] = kv.group(2)
+                                elif kv.group(3) is not None:
+                                    arguments[key] = _to_number(kv.group(3))
 
-        # Remove tool_call blocks from content
-        if tool_calls:
-            cleaned_content = re.sub(
-                r"<tool_call>.*?(?:</tool_call>|\}(?=\s*(?:<|$|Error)))",
-                "",
-                content,
-                flags=re.DOTALL,
-            ).strip()
+        except Exception:
+            return []
 
-        return cleaned_content, tool_calls if tool_calls else None
+        return [(tool_name, arguments)] if tool_name else []
 
-    def _parse_bracket_tool_calls(
-        self, content: str
-    ) -> tuple[str, list[dict[str, Any]] | None]:
-        """Parse [TOOL_CALL]...[/TOOL_CALL] formatted tool calls.
+    def _parse_bracket_block(self, block: str) -> list[tuple[str, Any]]:
+        """Parse the body of one [TOOL_CALL]...[/TOOL_CALL] block.
 
         Supports multiple formats:
         1. Arrow notation with CLI args:
@@ -178,110 +416,72 @@ class OpenAIModelWithThinkingTraces(OpenAIModel):
            [/TOOL_CALL]
 
         Returns:
-            Tuple of (cleaned_content, tool_calls_list or None)
+            List of (tool_name, arguments) pairs, empty if nothing was parsed
         """
-        if not content or "[TOOL_CALL]" not in content:
-            return content, None
-
-        tool_calls = []
-        cleaned_content = content
-
-        # Pattern to match [TOOL_CALL]...[/TOOL_CALL] blocks
-        pattern = r"\[TOOL_CALL\](.*?)\[/TOOL_CALL\]"
-        matches = list(re.finditer(pattern, content, re.DOTALL))
-
-        for idx, match in enumerate(matches):
-            block = match.group(1).strip()
-            tool_name = None
-            arguments = {}
-
-            try:
-                # Try Format 1: Arrow notation {tool => "tool_name", args => {...}}
-                tool_name_match = re.search(r'\{\s*tool\s*=>\s*"([^"]+)"', block)
-                if tool_name_match:
-                    tool_name = tool_name_match.group(1)
-
-                    # Extract arguments from the args => {...} block
-                    args_match = re.search(
-                        r"args\s*=>\s*\{([^}]*(?:\{[^}]*\}[^}]*)*)\}",
-                        block,
-                        re.DOTALL,
-                    )
-
-                    if args_match:
-                        args_content = args_match.group(1)
-                        # Parse CLI-style arguments: --param value or --param "value"
-                        arg_pattern = r'--(\w+)\s+(?:"([^"]*)"|([\S]+))'
-                        for arg_match in re.finditer(arg_pattern, args_content):
-                            param_name = arg_match.group(1)
-                            param_value = (
-                                arg_match.group(2)
-                                if arg_match.group(2) is not None
-                                else arg_match.group(3)
-                            )
-                            if param_value.isdigit():
-                                arguments[param_name] = int(param_value)
-                            else:
-                                arguments[param_name] = param_value
-
-                # Try Format 2: JSON-like with single quotes {'name': 'tool_name', 'args': {...}}
-                if tool_name is None:
-                    # Convert single quotes to double quotes for JSON parsing
-                    json_block = block.replace("'", '"')
-                    # Try to parse as JSON
-                    try:
-                        data = json.loads(json_block)
-                        if isinstance(data, dict):
-                            tool_name = data.get("name")
-                            args_data = data.get("args", {})
-                            if isinstance(args_data, dict):
-                                arguments = args_data
-                    except json.JSONDecodeError:
-                        # If JSON parsing fails, try regex extraction
-                        name_match = re.search(
-                            r"['\"]name['\"]\s*:\s*['\"]([^'\"]+)['\"]", block
-                        )
-                        if name_match:
-                            tool_name = name_match.group(1)
-
-                            # Extract args using regex
-                            args_section = re.search(
-                                r"['\"]args['\"]\s*:\s*\{([^}]*)\}", block, re.DOTALL
-                            )
-                            if args_section:
-                                args_content = args_section.group(1)
-                                # Parse key-value pairs: 'key': 'value' or 'key': 123
-                                kv_pattern = r"['\"](\w+)['\"]\s*:\s*(?:['\"]([^'\"]*)['\"]|(\d+))"
-                                for kv_match in re.finditer(kv_pattern, args_content):
-                                    key = kv_match.group(1)
-                                    if kv_match.group(2) is not None:
-                                        arguments[key] = kv_match.group(2)
-                                    elif kv_match.group(3) is not None:
-                                        arguments[key] = int(kv_match.group(3))
-
-                if tool_name:
-                    tool_call = {
-                        "id": f"call_{idx}",
-                        "type": "function",
-                        "function": {
-                            "name": tool_name,
-                            "arguments": json.dumps(arguments),
-                        },
-                    }
-                    tool_calls.append(tool_call)
-
-            except Exception:
-                continue
-
-        if tool_calls:
-            cleaned_content = re.sub(pattern, "", content, flags=re.DOTALL).strip()
+        tool_name = None
+        arguments = {}
+
+        try:
+            # Try Format 1: Arrow notation {tool => "tool_name", args => {...}}
+            tool_name_match = _ARROW_TOOL_RE.search(block)
+            if tool_name_match:
+                tool_name = tool_name_match.group(1)
+
+                # Extract arguments from the args => {...} block. CLI values
+                # are bare words, so only double quotes delimit strings here
+                args_match = _ARROW_ARGS_RE.search(block)
+                args_end = (
+                    _find_matching_brace(block, args_match.end(), quotes='"')
+                    if args_match
+                    else -1
+                )
 
-        return cleaned_content, tool_calls if tool_calls else None
+                if args_end != -1:
+                    args_content = block[args_match.end() + 1 : args_end]
+                    arguments = _parse_cli_args(args_content)
+
+            # Try Format 2: JSON-like with single quotes {'name': 'tool_name', 'args': {...}}
+            if tool_name is None:
+                tool_name = _extract_quoted_field(block, "name")
+                if tool_name is not None:
+                    # Isolate the args dict and parse only that, as JSON or as a
+                    # Python literal when it uses single quotes
+                    args_data = None
+                    args_start = _find_field_value(block, "args")
+                    if args_start != -1 and block.startswith("{", args_start):
+                        args_end = _find_matching_brace(block, args_start)
+                        if args_end != -1:
+                            args_block = block[args_start : args_end + 1]
+                            try:
+                                args_data = json_loads(args_block)
+                            except json.JSONDecodeError:
+                                try:
+                                    args_data = ast.literal_eval(args_block)
+                                except (ValueError, TypeError, SyntaxError):
+                                    pass
 
-    def _parse_action_tool_calls(
-        self, content: str
-    ) -> tuple[str, list[dict[str, Any]] | None]:
-        """Parse Action: {...} formatted tool calls.
+                    if isinstance(args_data, dict):
+                        arguments = args_data
+                    else:
+                        # Fall back to regex extraction for unbalanced quoting
+                        args_section = _QUOTED_ARGS_RE.search(block)
+                        if args_section:
+                            args_content = args_section.group(1)
+                            # Parse key-value pairs: 'key': 'value' or 'key': 123
+                            for kv_match in _QUOTED_KV_RE.finditer(args_content):
+                                key = kv_match.group(1)
+                                if kv_match.group(2) is not None:
+                                    arguments[key] = kv_match.group(2)
+                                elif kv_match.group(3) is not None:
+                                    arguments[key] = int(kv_match.group(3))
+
+        except Exception:
+            return []
+
+        return [(tool_name, arguments)] if tool_name else []
+
+    def _parse_action_block(self, block: str) -> list[tuple[str, Any]]:
+        """Parse one Action: {...} block.
 
         Format example:
         Action:
@@ -291,192 +491,97 @@ class OpenAIModelWithThinkingTraces(OpenAIModel):
         }
 
         Returns:
-            Tuple of (cleaned_content, tool_calls_list or None)
+            List of (tool_name, arguments) pairs, empty if nothing was parsed
         """
-        if not content or "Action:" not in content:
-            return content, None
-
-        tool_calls = []
-        cleaned_content = content
-
-        # Pattern to match Action: followed by JSON
-        # Match Action: then whitespace then { ... }
-        action_pattern = r"Action:\s*\{([^}]*(?:\{[^}]*\}[^}]*)*)\}"
-        matches = list(re.finditer(action_pattern, content, re.DOTALL))
+        try:
+            json_content = block[block.index("{") :]
 
-        for idx, match in enumerate(matches):
+            # Try to parse as JSON
             try:
-                json_content = "{" + match.group(1) + "}"
-
-                # Try to parse as JSON
-                try:
-                    data = json.loads(json_content)
-                except json.JSONDecodeError:
-                    # If fails, continue to regex extraction
-                    data = None
-
-                if data and isinstance(data, dict):
-                    tool_name = data.get("name")
-                    arguments = data.get("arguments", {})
-
-                    if tool_name:
-                        tool_call = {
-                            "id": f"call_{idx}",
-                            "type": "function",
-                            "function": {
-                                "name": tool_name,
-                                "arguments": json.dumps(arguments)
-                                if isinstance(arguments, dict)
-                                else arguments,
-                            },
-                        }
-                        tool_calls.append(tool_call)
-                else:
-                    # Try regex extraction for malformed JSON
-                    block = match.group(0)
-                    name_match = re.search(r'"name"\s*:\s*"([^"]+)"', block)
-                    if name_match:
-                        tool_name = name_match.group(1)
-
-                        # Try to extract arguments
-                        arguments = {}
-                        args_match = re.search(
-                            r'"arguments"\s*:\s*\{([^}]*)\}', block, re.DOTALL
-                        )
-                        if args_match:
-                            args_content = args_match.group(1)
-                            # Extract simple key-value pairs
-                            kv_pattern = r'"(\w+)"\s*:\s*(?:"([^"]*)"|([\d.]+)|(\w+))'
-                            for kv in re.finditer(kv_pattern, args_content):
-                                key = kv.group(1)
-                                if kv.group(2) is not None:
-                                    arguments[key] = kv.group(2)
-                                elif kv.group(3) is not None:
-                                    val = kv.group(3)
-                                    arguments[key] = (
-                                        int(val) if val.isdigit() else float(val)
-                                    )
-                                elif kv.group(4) is not None:
-                                    arguments[key] = kv.group(4)
-
-                        tool_call = {
-                            "id": f"call_{idx}",
-                            "type": "function",
-                            "function": {
-                                "name": tool_name,
-                                "arguments": json.dumps(arguments),
-                            },
-                        }
-                        tool_calls.append(tool_call)
-
-            except Exception:
-                continue
+                data = json_loads(json_content)
+            except json.JSONDecodeError:
+                # If fails, continue to regex extraction
+                data = None
 
-        if tool_calls:
-            cleaned_content = re.sub(
-                action_pattern, "", content, flags=re.DOTALL
-            ).strip()
-            # Also remove trailing <cite> tags that follow actions
-            cleaned_content = re.sub(
-                r"<cite\s+id=['\"][^'\"]*['\"]\s*>\s*</cite>\s*---?",
-                "",
-                cleaned_content,
-            ).strip()
+            if data and isinstance(data, dict):
+                tool_name = data.get("name")
+                if tool_name:
+                    return [(tool_name, data.get("arguments", {}))]
+                return []
 
-        return cleaned_content, tool_calls if tool_calls else None
+            # Try regex extraction for malformed JSON
+            name_match = _ACTION_NAME_RE.search(block)
+            if not name_match:
+                return []
+            tool_name = name_match.group(1)
 
-    def _parse_json_tool_calls(
-        self, content: str
-    ) -> tuple[str, list[dict[str, Any]] | None]:
-        """Parse JSON-formatted tool calls in various formats.
+            # Try to extract arguments
+            arguments = {}
+            args_match = _ACTION_ARGS_RE.search(block)
+            if args_match:
+                args_content = args_match.group(1)
+                # Extract simple key-value pairs
+                for kv in _ACTION_KV_RE.finditer(args_content):
+                    key = kv.group(1)
+                    if kv.group(2) is not None:
+                        arguments[key] = kv.group(2)
+                    elif kv.group(3) is not None:
+                        arguments[key] = _to_number(kv.group(3))
+                    elif kv.group(4) is not None:
+                        arguments[key] = kv.group(4)
+
+            return [(tool_name, arguments)]
+
+        except Exception:
+            return []
+
+    def _parse_event_block(self, json_str: str) -> list[tuple[str, Any]]:
+        """Parse the JSON payload of one [Event: {...}] block.
 
         Handles formats like:
         - [Event: {"tool_calls": [...]}]
-        - {"tool": "name", "args": {...}}
+        - [Event: {"webpage_url": "..."}]
 
         Returns:
-            Tuple of (cleaned_content, tool_calls_list or None)
+            List of (tool_name, arguments) pairs, empty if nothing was parsed
         """
-        if not content:
-            return content, None
+        try:
+            data = json_loads(json_str)
+        except json.JSONDecodeError:
+            return []
 
         tool_calls = []
-        cleaned_content = content
-
-        # Pattern 1: [Event: {"tool_calls": [...]}] format
-        event_pattern = r"\[Event:\s*(\{[^]]*\})\s*\]"
-        event_matches = list(re.finditer(event_pattern, content, re.DOTALL))
-
-        for idx, match in enumerate(event_matches):
-            try:
-                json_str = match.group(1)
-                data = json.loads(json_str)
-
-                if "tool_calls" in data:
-                    calls = data["tool_calls"]
-                    if isinstance(calls, list):
-                        for call in calls:
-                            if isinstance(call, dict):
-                                # Handle {"query": "...", "search_type": "..."} format
-                                tool_name = call.pop("search_type", None) or call.pop(
-                                    "tool", None
-                                )
-                                if tool_name:
-                                    # Map search_type to actual tool names
-                                    tool_name_map = {
-                                        "scholarly_search": "semantic_scholar_paper_search",
-                                        "web_search": "serper_search_tool",
-                                    }
-                                    tool_name = tool_name_map.get(tool_name, tool_name)
-
-                                    tool_call = {
-                                        "id": f"call_{len(tool_calls)}",
-                                        "type": "function",
-                                        "function": {
-                                            "name": tool_name,
-                                            "arguments": json.dumps(call),
-                                        },
-                                    }
-                                    tool_calls.append(tool_call)
-                    elif isinstance(calls, dict):
-                        # Single tool call as dict (e.g., webpage_url)
-                        if "webpage_url" in calls:
-                            tool_call = {
-                                "id": f"call_{len(tool_calls)}",
-                                "type": "function",
-                                "function": {
-                                    "name": "crawl4ai_fetch_webpage_content",
-                                    "arguments": json.dumps(
-                                        {"url": calls["webpage_url"]}
-                                    ),
-                                },
-                            }
-                            tool_calls.append(tool_call)
-                elif "webpage_url" in data:
-                    tool_call = {
-                        "id": f"call_{len(tool_calls)}",
-                        "type": "function",
-                        "function": {
-                            "name": "crawl4ai_fetch_webpage_content",
-                            "arguments": json.dumps({"url": data["webpage_url"]}),
-                        },
-                    }
-                    tool_calls.append(tool_call)
-
-            except json.JSONDecodeError:
-                continue
-
-        if tool_calls:
-            cleaned_content = re.sub(
-                event_pattern, "", content, flags=re.DOTALL
-            ).strip()
+        if "tool_calls" in data:
+            calls = data["tool_calls"]
+            if isinstance(calls, list):
+                for call in calls:
+                    if isinstance(call, dict):
+                        # Handle {"query": "...", "search_type": "..."} format
+                        tool_name = call.pop("search_type", None) or call.pop(
+                            "tool", None
+                        )
+                        if tool_name:
+                            # Map search_type to actual tool names
+                            tool_name = _TOOL_NAME_MAP.get(tool_name, tool_name)
+                            tool_calls.append((tool_name, call))
+            elif isinstance(calls, dict):
+                # Single tool call as dict (e.g., webpage_url)
+                if "webpage_url" in calls:
+                    tool_calls.append(
+                        (
+                            "crawl4ai_fetch_webpage_content",
+                            {"url": calls["webpage_url"]},
+                        )
+                    )
+        elif "webpage_url" in data:
+            tool_calls.append(
+                ("crawl4ai_fetch_webpage_content", {"url": data["webpage_url"]})
+            )
 
-        return cleaned_content, tool_calls if tool_calls else None
+        return tool_calls
 
-    def _parse_invoke_tool_calls(
-        self, content: str
-    ) -> tuple[str, list[dict[str, Any]] | None]:
-        """Parse <invoke><tool_name>...</tool_name></invoke> formatted tool calls.
+    def _parse_invoke_block(self, invoke_content: str) -> list[tuple[str, Any]]:
+        """Parse the body of one <invoke>...</invoke> block.
 
         Format example:
         <invoke><semantic_scholar_paper_search>
@@ -486,134 +591,152 @@ class OpenAIModelWithThinkingTraces(OpenAIModel):
         </semantic_scholar_paper_search></invoke>
 
         Returns:
-            Tuple of (cleaned_content, tool_calls_list or None)
+            List of (tool_name, arguments) pairs, empty if nothing was parsed
         """
-        if not content or "<invoke>" not in content:
-            return content, None
-
-        tool_calls = []
-        cleaned_content = content
-
-        # Pattern to match <invoke>...</invoke> blocks
-        invoke_pattern = r"<invoke>(.*?)</invoke>"
-        matches = list(re.finditer(invoke_pattern, content, re.DOTALL))
-
-        for idx, match in enumerate(matches):
-            invoke_content = match.group(1).strip()
-
-            try:
-                # Clean up escaped newlines that might be in the content
+        try:
+            # Clean up escaped newlines that might be in the content
+            if "\\n" in invoke_content:
                 invoke_content = invoke_content.replace("\\n", "\n")
 
-                # Find the tool name - it's the outermost tag inside <invoke>
-                # Pattern: <tool_name>...</tool_name>
-                tool_tag_match = re.match(
-                    r"<([a-zA-Z_][a-zA-Z0-9_]*)>(.*?)</\1>",
-                    invoke_content,
-                    re.DOTALL,
-                )
+            # Find the tool name - it's the outermost tag inside <invoke>
+            # Pattern: <tool_name>...</tool_name>
+            tool_tag_match = _XML_ELEMENT_RE.match(invoke_content)
 
-                if not tool_tag_match:
-                    continue
+            if not tool_tag_match:
+                return []
 
-                tool_name = tool_tag_match.group(1)
-                inner_content = tool_tag_match.group(2)
+            tool_name = tool_tag_match.group(1)
+            inner_content = tool_tag_match.group(2)
 
-                # Extract arguments from inner XML tags
-                arguments = {}
-                arg_pattern = r"<([a-zA-Z_][a-zA-Z0-9_]*)>(.*?)</\1>"
-                for arg_match in re.finditer(arg_pattern, inner_content, re.DOTALL):
-                    arg_name = arg_match.group(1)
-                    arg_value = arg_match.group(2).strip()
+            # Extract arguments from inner XML tags
+            arguments = {}
+            for arg_match in _XML_ELEMENT_RE.finditer(inner_content):
+                arg_name = arg_match.group(1)
+                arg_value = arg_match.group(2).strip()
 
-                    # Skip empty values
-                    if not arg_value:
-                        continue
+                # Skip empty values
+                if not arg_value:
+                    continue
 
-                    # Convert numeric strings to appropriate types
-                    if arg_value.isdigit():
-                        arguments[arg_name] = int(arg_value)
-                    else:
-                        arguments[arg_name] = arg_value
-
-                tool_call = {
-                    "id": f"call_{idx}",
-                    "type": "function",
-                    "function": {
-                        "name": tool_name,
-                        "arguments": json.dumps(arguments),
-                    },
-                }
-                tool_calls.append(tool_call)
-
-            except Exception:
-                continue
+                # Convert numeric strings to appropriate types
+                arguments[arg_name] = _to_int(arg_value)
 
-        if tool_calls:
-            cleaned_content = re.sub(
-                invoke_pattern, "", content, flags=re.DOTALL
-            ).strip()
+            return [(tool_name, arguments)]
 
-        return cleaned_content, tool_calls if tool_calls else None
+        except Exception:
+            return []
 
     def _parse_all_tool_calls(
         self, content: str
-    ) -> tuple[str, list[dict[str, Any]] | None]:
+    ) -> tuple[str, list[ChatCompletionMessageToolCall] | None]:
         """Parse tool calls from content using all supported formats.
 
-        Tries parsing in order:
+        Scans the content once for the start of any supported block:
         1. XML format: <tool_call>...</tool_call>
         2. Invoke format: <invoke><tool_name>...</tool_name></invoke>
         3. Bracket format: [TOOL_CALL]...[/TOOL_CALL]
         4. Action format: Action: {...}
         5. JSON/Event format: [Event: {...}]
 
+        Tool calls are numbered in the order they appear in the content. Blocks
+        of every format that yielded at least one tool call are removed from
+        the returned content.
+
         Returns:
             Tuple of (cleaned_content, combined_tool_calls_list or None)
         """
         if not content:
             return content, None
 
+        cleaned_content, tool_calls = self._scan_tool_calls_cached(content)
+        if not tool_calls:
+            return content, None
+
+        # Fresh objects per call, since the cached result is shared
+        return cleaned_content, [
+            _make_tool_call(idx, tool_name, arguments)
+            for idx, (tool_name, arguments) in enumerate(tool_calls)
+        ]
+
+    def _scan_tool_calls(self, content: str) -> tuple[str, tuple[tuple[str, Any], ...]]:
+        """Find and parse every tool-call block in content.
+
+        Returns:
+            Tuple of (cleaned_content, (tool_name, arguments) pairs) with dict
+            arguments already JSON-encoded
+        """
+        parsers = {
+            "<tool_call>": self._parse_xml_block,
+            "<invoke>": self._parse_invoke_block,
+            "[TOOL_CALL]": self._parse_bracket_block,
+            "Action:": self._parse_action_block,
+            "[Event:": self._parse_event_block,
+        }
         all_tool_calls = []
+        spans = {marker: [] for marker in parsers}
+        parsed_markers = set()
+
+        pos = 0
+        while match := _BLOCK_START_RE.search(content, pos):
+            marker = match.group()
+            start = match.start()
+            end = None
+            if marker == "Action:":
+                # Action: then whitespace then a balanced { ... } block
+                brace = match.end()
+                while brace < len(content) and content[brace].isspace():
+                    brace += 1
+                if content.startswith("{", brace):
+                    close = _find_matching_brace(content, brace, quotes='"')
+                    if close != -1:
+                        end = close + 1
+                        block = content[start:end]
+            else:
+                block_match = _BLOCK_PATTERNS[marker].match(content, start)
+                if block_match:
+                    end = block_match.end()
+                    block = block_match.group(1).strip()
+
+            if end is None:
+                pos = match.end()
+                continue
+
+            spans[marker].append((start, end))
+            tool_calls = parsers[marker](block)
+            if not tool_calls:
+                # A malformed block may still wrap a block of another format
+                pos = match.end()
+                continue
+
+            serialized = []
+            for tool_name, arguments in tool_calls:
+                if isinstance(arguments, dict):
+                    try:
+                        arguments = json_dumps(arguments)
+                    except TypeError:
+                        # Arguments that are not JSON, e.g. a set literal
+                        continue
+                serialized.append((tool_name, arguments))
+            if not serialized:
+                pos = match.end()
+                continue
+
+            parsed_markers.add(marker)
+            all_tool_calls.extend(serialized)
+            pos = end
+
+        if not all_tool_calls:
+            return content, ()
+
+        content = _strip_spans(
+            content,
+            sorted(span for marker in parsed_markers for span in spans[marker]),
+        ).strip()
+        if "Action:" in parsed_markers:
+            # Also remove trailing <cite> tags that follow actions
+            content = _EMPTY_CITE_RE.sub("", content).strip()
 
-        # Try XML format first
-        content, xml_tool_calls = self._parse_xml_tool_calls(content)
-        if xml_tool_calls:
-            all_tool_calls.extend(xml_tool_calls)
-
-        # Try invoke format
-        content, invoke_tool_calls = self._parse_invoke_tool_calls(content)
-        if invoke_tool_calls:
-            # Re-number IDs to avoid conflicts
-            for i, tc in enumerate(invoke_tool_calls):
-                tc["id"] = f"call_{len(all_tool_calls) + i}"
-            all_tool_calls.extend(invoke_tool_calls)
-
-        # Try bracket/arrow format
-        content, bracket_tool_calls = self._parse_bracket_tool_calls(content)
-        if bracket_tool_calls:
-            # Re-number IDs to avoid conflicts
-            for i, tc in enumerate(bracket_tool_calls):
-                tc["id"] = f"call_{len(all_tool_calls) + i}"
-            all_tool_calls.extend(bracket_tool_calls)
-
-        # Try Action format
-        content, action_tool_calls = self._parse_action_tool_calls(content)
-        if action_tool_calls:
-            # Re-number IDs to avoid conflicts
-            for i, tc in enumerate(action_tool_calls):
-                tc["id"] = f"call_{len(all_tool_calls) + i}"
-            all_tool_calls.extend(action_tool_calls)
-
-        # Try JSON/Event format
-        content, json_tool_calls = self._parse_json_tool_calls(content)
-        if json_tool_calls:
-            # Re-number IDs to avoid conflicts
-            for i, tc in enumerate(json_tool_calls):
-                tc["id"] = f"call_{len(all_tool_calls) + i}"
-            all_tool_calls.extend(json_tool_calls)
-
-        return content, all_tool_calls if all_tool_calls else None
+        return content, tuple(all_tool_calls)
 
     @weave.op
     def generate(
@@ -629,55 +752,58 @@ class OpenAIModelWithThinkingTraces(OpenAIModel):
             stop_sequences=stop_sequences,
             response_format=response_format,
             tools_to_call_from=tools_to_call_from,
-            model=self.model_id,
-            custom_role_conversions=self.custom_role_conversions,
-            convert_images_to_image_urls=True,
-            **kwargs,
+            **{**self._static_completion_kwargs, **kwargs},
         )
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = make_key(**completion_kwargs)
+            cached_message = self.response_cache.get(cache_key)
+            if cached_message is not None:
+                logger.debug("LLM response cache hit for %s", self.model_id)
+                # Callers may update the message in place
+                return copy.deepcopy(cached_message)
+
         self._apply_rate_limit()
         response = self.retryer(
             self.client.chat.completions.create, **completion_kwargs
         )
         content = response.choices[0].message.content
         reasoning_trace = getattr(response.choices[0].message, "reasoning", None)
-        content = (
-            f"<thinking>{reasoning_trace}</thinking>\n\n{content}"
-            if reasoning_trace is not None
-            else content
-        )
-        content = content.strip()
-        if stop_sequences is not None and not self.supports_stop_parameter:
-            content = remove_content_after_stop_sequences(content, stop_sequences)
-
-        # Parse tool calls from content if no native tool calls exist
+        if reasoning_trace:
+            content = f"<thinking>{reasoning_trace}</thinking>\n\n{content or ''}"
+        # Content is None when the API only returns native tool calls
+        if content:
+            content = content.strip()
+            if stop_sequences is not None and not self.supports_stop_parameter:
+                content = remove_content_after_stop_sequences(content, stop_sequences)
+
+        # Parse tool calls from content if no native tool calls exist and the
+        # content contains the marker of at least one supported format
         # Supports XML, bracket/arrow notation, and JSON/Event formats
         tool_calls = response.choices[0].message.tool_calls
-        if tool_calls is None and content:
-            content, parsed_tool_calls = self._parse_all_tool_calls(content)
-            if parsed_tool_calls:
-                # Convert to the format expected by smolagents
-                from openai.types.chat import ChatCompletionMessageToolCall
-                from openai.types.chat.chat_completion_message_tool_call import Function
-
-                tool_calls = [
-                    ChatCompletionMessageToolCall(
-                        id=tc["id"],
-                        type=tc["type"],
-                        function=Function(
-                            name=tc["function"]["name"],
-                            arguments=tc["function"]["arguments"],
-                        ),
-                    )
-                    for tc in parsed_tool_calls
-                ]
-
-        return ChatMessage(
+        if (
+            tool_calls is None
+            and content
+            and any(marker in content for marker in _TOOL_CALL_MARKERS)
+        ):
+            content, tool_calls = self._parse_all_tool_calls(content)
+
+        message = ChatMessage(
             role=response.choices[0].message.role,
             content=content,
             tool_calls=tool_calls,
             raw=response,
-            token_usage=TokenUsage(
+            token_usage=TokenUsageWithCache(
                 input_tokens=response.usage.prompt_tokens,
                 output_tokens=response.usage.completion_tokens,
+                cached_tokens=getattr(
+                    getattr(response.usage, "prompt_tokens_details", None),
+                    "cached_tokens",
+                    None,
+                )
+                or 0,
             ),
         )
+        if cache_key is not None:
+            self.response_cache.set(cache_key, copy.deepcopy(message))
+        return message
@@ -46,3 +46,9 @@ LONG_ANSWER_PROMPT_TEMPLATE = """
 
 For the given question, please write a comprehensive, evidence-backed answers to scientific questions. You should ground every nontrivial claim in retrieved snippets. Cite using <cite id="...">...</cite> drawn only from returned snippets. Please prefer authoritative sources (peer-reviewed papers, reputable benchmarks/docs) and prioritize recent work for fast-moving areas. You should acknowledge uncertainty and conflicts; if evidence is thin or sources disagree, state it and explain what additional evidence would resolve it. It's important to structure with clear markdown headers and a coherent flow. In each section, write 2-5 sentence paragraphs with clear topic sentences and transitions; use lists sparingly only when they improve clarity. Ideally, you should synthesize rather than enumerate content: it's helpful to group findings across papers, explain relationships, and build a coherent narrative that answers the question, supported by citations. Most importantly, DO NOT invent snippets or citations and never fabricate content.
 """.strip()
+
+DIRECT_ANSWER_PROMPT_TEMPLATE = """
+{query}
+
+Answer the given question directly, without searching, and provide the final answer in the following format: <answer>answer</answer>.
+""".strip()
@@ -1,7 +1,19 @@
-from typing import Any
+import json
+from typing import Any, Iterable
 
-from smolagents import ToolCallingAgent
-from smolagents.utils import AgentMaxStepsError
+from smolagents import (
+    ActionStep,
+    ChatMessage,
+    MessageRole,
+    TaskStep,
+    TokenUsage,
+    ToolCallingAgent,
+)
+from smolagents.utils import AgentMaxStepsError, truncate_content
+
+MEMORY_SUMMARY_PROMPT = """
+Summarize the research progress below for the task you are working on. Keep every fact, number, source URL and snippet ID that could be needed for the final answer, and drop everything else. Reply with the summary only.
+""".strip()
 
 
 class TokenLimitedToolCallingAgent(ToolCallingAgent):
@@ -16,14 +28,170 @@ class TokenLimitedToolCallingAgent(ToolCallingAgent):
         self,
         max_output_tokens: int = 10000,
         *args,
+        cache_tool_calls: bool = True,
+        uncached_tools: Iterable[str] = (),
+        memory_window: int | None = None,
+        summary_interval: int = 10,
+        max_summary_observation_chars: int = 2000,
         **kwargs,
     ):
         # Set a high max_steps as fallback safety to prevent infinite loops
         if "max_steps" not in kwargs:
             kwargs["max_steps"] = 1000
 
+        # Filled on the first initialize_system_prompt call during __init__
+        self._system_prompt_cache: str | None = None
         super().__init__(*args, **kwargs)
         self.max_output_tokens = max_output_tokens
+        self.cache_tool_calls = cache_tool_calls
+        # Tools with side effects must run every time they are called
+        self.uncached_tools = frozenset(uncached_tools) | {"final_answer"}
+        self._tool_call_cache: dict[str, Any] = {}
+        self.memory_window = memory_window
+        self.summary_interval = summary_interval
+        self.max_summary_observation_chars = max_summary_observation_chars
+        self._rolling_summary: str | None = None
+        self._summarized_action_steps = 0
+        # Usage of the memory summary calls, which are not part of any step
+        self.summary_token_usage: list[TokenUsage] = []
+
+    def initialize_system_prompt(self) -> str:
+        """
+        Override initialize_system_prompt to render the prompt only once.
+
+        The prompt depends only on the tools, managed agents and instructions,
+        which don't change after construction, but run() re-renders it on every
+        call.
+        """
+        if self._system_prompt_cache is None:
+            self._system_prompt_cache = super().initialize_system_prompt()
+        return self._system_prompt_cache
+
+    def run(self, *args, **kwargs) -> Any:
+        # Tool results and the memory summary are only reused within a single run
+        self._tool_call_cache.clear()
+        self._rolling_summary = None
+        self._summarized_action_steps = 0
+        self.summary_token_usage = []
+        return super().run(*args, **kwargs)
+
+    def write_memory_to_messages(
+        self, summary_mode: bool = False, full_history: bool = False
+    ) -> list[ChatMessage]:
+        """
+        Override write_memory_to_messages to keep the prompt size bounded when
+        memory_window is set.
+
+        The system prompt and the task are always kept, the last memory_window
+        action steps are kept verbatim and older steps are replaced by a rolling
+        summary that is refreshed every summary_interval steps. Pass
+        full_history=True to get the complete, unsummarized conversation.
+        """
+        if full_history or self.memory_window is None:
+            return super().write_memory_to_messages(summary_mode=summary_mode)
+
+        steps = self.memory.steps
+        action_indices = [
+            index for index, step in enumerate(steps) if isinstance(step, ActionStep)
+        ]
+        unsummarized = len(action_indices) - self._summarized_action_steps
+        if unsummarized >= self.memory_window + self.summary_interval:
+            self._update_rolling_summary(
+                steps, action_indices, len(action_indices) - self.memory_window
+            )
+        if self._summarized_action_steps == 0:
+            return super().write_memory_to_messages(summary_mode=summary_mode)
+
+        # Everything before the first unsummarized action step is covered by the
+        # summary, apart from the task itself
+        cutoff = action_indices[self._summarized_action_steps]
+        messages = self.memory.system_prompt.to_messages(summary_mode=summary_mode)
+        for step in steps[:cutoff]:
+            if isinstance(step, TaskStep):
+                messages.extend(step.to_messages(summary_mode=summary_mode))
+        messages.append(
+            ChatMessage(
+                role=MessageRole.USER,
+                content=[
+                    {
+                        "type": "text",
+                        "text": f"Summary of your earlier research steps:\n{self._rolling_summary}",
+                    }
+                ],
+            )
+        )
+        for step in steps[cutoff:]:
+            messages.extend(step.to_messages(summary_mode=summary_mode))
+        return messages
+
+    def _update_rolling_summary(
+        self, steps: list, action_indices: list[int], summarized_action_steps: int
+    ) -> None:
+        start = (
+            action_indices[self._summarized_action_steps]
+            if self._summarized_action_steps
+            else 0
+        )
+        end = action_indices[summarized_action_steps]
+        history = []
+        if self._rolling_summary:
+            history.append(f"Summary so far:\n{self._rolling_summary}")
+        for step in steps[start:end]:
+            if isinstance(step, TaskStep):
+                continue
+            for message in step.to_messages():
+                if isinstance(message.content, str):
+                    texts = [message.content]
+                else:
+                    texts = [
+                        part["text"]
+                        for part in message.content or ()
+                        if part.get("type") == "text"
+                    ]
+                history.extend(
+                    truncate_content(
+                        text, max_length=self.max_summary_observation_chars
+                    )
+                    for text in texts
+                )
+        response = self.model.generate(
+            [
+                ChatMessage(
+                    role=MessageRole.SYSTEM,
+                    content=[{"type": "text", "text": MEMORY_SUMMARY_PROMPT}],
+                ),
+                ChatMessage(
+                    role=MessageRole.USER,
+                    content=[{"type": "text", "text": "\n\n".join(history)}],
+                ),
+            ]
+        )
+        # Count the summary against the token budget and in the run totals
+        token_usage = response.token_usage
+        if token_usage is not None:
+            self.monitor.total_input_token_count += token_usage.input_tokens
+            self.monitor.total_output_token_count += token_usage.output_tokens
+            self.summary_token_usage.append(token_usage)
+        summary = response.content or ""
+        # Drop the reasoning trace the model prepends to its content
+        self._rolling_summary = summary.rsplit("</thinking>", 1)[-1].strip()
+        self._summarized_action_steps = summarized_action_steps
+
+    def execute_tool_call(self, tool_name: str, arguments: dict[str, str] | str) -> Any:
+        """
+        Override execute_tool_call to reuse the result of an identical earlier
+        tool call in the same run instead of repeating the request.
+        """
+        if not self.cache_tool_calls or tool_name in self.uncached_tools:
+            return super().execute_tool_call(tool_name, arguments)
+
+        key = f"{tool_name}|{json.dumps(arguments, sort_keys=True, default=str)}"
+        if key in self._tool_call_cache:
+            return f"{self._tool_call_cache[key]}\n(cached result of an identical earlier call)"
+
+        result = super().execute_tool_call(tool_name, arguments)
+        self._tool_call_cache[key] = result
+        return result
 
     def step(self, *args, **kwargs) -> Any:
         """
@@ -1,6 +1,11 @@
-import requests
+import os
+
 from smolagents import Tool
 
+from athena_dr.agent.tools.http_session import SESSION
+
+TIMEOUT = int(os.getenv("CODE_EXECUTION_TIMEOUT", 300))
+
 
 class CodeExecutionTool(Tool):
     name = "code_execution_tool"
@@ -19,6 +24,8 @@ class CodeExecutionTool(Tool):
         self.executor_url = "http://localhost:8080/run_code"
 
     def forward(self, code: str) -> str:
-        return requests.post(
-            self.executor_url, json={"code": code, "language": "python"}
+        return SESSION.post(
+            self.executor_url,
+            json={"code": code, "language": "python"},
+            timeout=TIMEOUT,
         ).json()
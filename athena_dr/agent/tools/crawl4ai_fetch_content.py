@@ -1,11 +1,15 @@
 import asyncio
-from threading import Thread
-from typing import Dict, Optional
+import atexit
+import concurrent.futures
+import threading
+from typing import Any, Optional
 
 import weave
 from pydantic import BaseModel, Field
 from smolagents import Tool
 
+from athena_dr.agent.cache import DiskCache, TTLCache, make_key
+
 
 class Crawl4AiResult(BaseModel):
     url: str
@@ -20,6 +24,80 @@ class Crawl4AiResult(BaseModel):
     error: Optional[str] = Field(None, description="Only present when success=False")
 
 
+# Launching a browser takes longer than fetching most pages, so one crawler per
+# headless mode is started on first use and shared by every fetch. Crawlers
+# are bound to the event loop they were started on, so all fetches run on a
+# single background loop.
+_LOOP: asyncio.AbstractEventLoop | None = None
+_LOOP_LOCK = threading.Lock()
+_CRAWLERS: dict[bool, Any] = {}
+_CRAWLERS_LOCK = asyncio.Lock()
+# Extra time allowed on top of the page timeout, mostly for starting the
+# browser on the first fetch
+FETCH_TIMEOUT_MARGIN_S = 30
+
+
+def _run_loop(loop: asyncio.AbstractEventLoop) -> None:
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=_run_loop, args=(loop,), daemon=True).start()
+            _LOOP = loop
+    return _LOOP
+
+
+async def _get_crawler(headless: bool):
+    from crawl4ai import AsyncWebCrawler, BrowserConfig
+
+    async with _CRAWLERS_LOCK:
+        crawler = _CRAWLERS.get(headless)
+        if crawler is None:
+            crawler = AsyncWebCrawler(config=BrowserConfig(headless=headless))
+            await crawler.start()
+            _CRAWLERS[headless] = crawler
+    return crawler
+
+
+async def _discard_crawler(headless: bool, crawler) -> None:
+    async with _CRAWLERS_LOCK:
+        # A concurrent fetch may already have replaced it
+        if _CRAWLERS.get(headless) is not crawler:
+            return
+        del _CRAWLERS[headless]
+    try:
+        await crawler.close()
+    except Exception:
+        pass
+
+
+async def _close_crawlers() -> None:
+    async with _CRAWLERS_LOCK:
+        crawlers = list(_CRAWLERS.values())
+        _CRAWLERS.clear()
+    for crawler in crawlers:
+        try:
+            await crawler.close()
+        except Exception:
+            pass
+
+
+@atexit.register
+def _shutdown() -> None:
+    if _LOOP is None:
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(_close_crawlers(), _LOOP).result(timeout=10)
+    except Exception:
+        pass
+    _LOOP.call_soon_threadsafe(_LOOP.stop)
+
+
 async def _fetch_markdown_async(
     url: str,
     query: Optional[str] = None,
@@ -30,8 +108,9 @@ async def _fetch_markdown_async(
     timeout_ms: int = 60000,
     include_html: bool = False,
 ) -> Crawl4AiResult:
+    """Fetch a page with the shared crawler; must run on the loop from _get_loop."""
     try:
-        from crawl4ai import AsyncWebCrawler, BrowserConfig, CacheMode, CrawlerRunConfig
+        from crawl4ai import CacheMode, CrawlerRunConfig
         from crawl4ai.content_filter_strategy import (
             BM25ContentFilter,
             PruningContentFilter,
@@ -63,7 +142,6 @@ async def _fetch_markdown_async(
             )
         )
 
-        browser_conf = BrowserConfig(headless=headless)
         run_conf = CrawlerRunConfig(
             cache_mode=CacheMode.BYPASS if bypass_cache else CacheMode.ENABLED,
             page_timeout=timeout_ms,
@@ -74,8 +152,14 @@ async def _fetch_markdown_async(
             word_count_threshold=10,
         )
 
-        async with AsyncWebCrawler(config=browser_conf) as crawler:
+        crawler = await _get_crawler(headless)
+        try:
             result = await crawler.arun(url=url, config=run_conf)
+        except Exception:
+            # Page errors come back in the result, so an exception means the
+            # browser itself failed; drop it so the next fetch relaunches it
+            await _discard_crawler(headless, crawler)
+            raise
 
         if not getattr(result, "success", True):
             return Crawl4AiResult(
@@ -111,7 +195,8 @@ async def _fetch_markdown_async(
         if include_html or not md_value:
             response_data["html"] = getattr(result, "html", "")
 
-        return Crawl4AiResult(**response_data)
+        # Built from values extracted above, so validation is skipped
+        return Crawl4AiResult.model_construct(**response_data)
     except Exception as e:
         return Crawl4AiResult(
             url=url,
@@ -133,58 +218,31 @@ def _fetch_markdown_sync(
     include_html: bool = False,
 ) -> Crawl4AiResult:
     try:
+        # Blocks the calling thread whether or not it runs an event loop itself
+        future = asyncio.run_coroutine_threadsafe(
+            _fetch_markdown_async(
+                url=url,
+                query=query,
+                ignore_links=ignore_links,
+                use_pruning=use_pruning,
+                bypass_cache=bypass_cache,
+                headless=headless,
+                timeout_ms=timeout_ms,
+                include_html=include_html,
+            ),
+            _get_loop(),
+        )
         try:
-            loop = asyncio.get_running_loop()
-        except RuntimeError:
-            loop = None
-
-        if loop and loop.is_running():
-            result_holder: Dict[str, Crawl4AiResult] = {}
-
-            def _runner():
-                new_loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(new_loop)
-                try:
-                    result_holder["result"] = new_loop.run_until_complete(
-                        _fetch_markdown_async(
-                            url=url,
-                            query=query,
-                            ignore_links=ignore_links,
-                            use_pruning=use_pruning,
-                            bypass_cache=bypass_cache,
-                            headless=headless,
-                            timeout_ms=timeout_ms,
-                            include_html=include_html,
-                        )
-                    )
-                finally:
-                    new_loop.close()
-
-            th = Thread(target=_runner)
-            th.start()
-            th.join()
-            return result_holder.get(
-                "result",
-                Crawl4AiResult(
-                    url=url,
-                    success=False,
-                    markdown="",
-                    html="",
-                    error="Unknown error",
-                ),
-            )
-        else:
-            return asyncio.run(
-                _fetch_markdown_async(
-                    url=url,
-                    query=query,
-                    ignore_links=ignore_links,
-                    use_pruning=use_pruning,
-                    bypass_cache=bypass_cache,
-                    headless=headless,
-                    timeout_ms=timeout_ms,
-                    include_html=include_html,
-                )
+            return future.result(timeout=timeout_ms / 1000 + FETCH_TIMEOUT_MARGIN_S)
+        except concurrent.futures.TimeoutError:
+            # Stop the fetch instead of leaving it running on the shared loop
+            future.cancel()
+            return Crawl4AiResult(
+                url=url,
+                success=False,
+                markdown="",
+                html="",
+                error=f"Timed out after {timeout_ms} ms",
             )
     except Exception as e:
         return Crawl4AiResult(
@@ -250,6 +308,24 @@ class Crawl4AIFetchTool(Tool):
     }
     output_type = "string"
 
+    def __init__(
+        self,
+        *args,
+        use_cache: bool = True,
+        cache: TTLCache | DiskCache | None = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        # Starting a browser for a page that was already read is the slowest
+        # repeat an agent can make. Pass a DiskCache to keep pages across
+        # processes
+        if not use_cache:
+            self._cache = None
+        elif cache is not None:
+            self._cache = cache
+        else:
+            self._cache = TTLCache(max_size=128, ttl=3600)
+
     @weave.op
     def forward(
         self,
@@ -263,6 +339,22 @@ class Crawl4AIFetchTool(Tool):
     ) -> str:
         import hashlib
 
+        # bypass_cache asks for a fresh fetch, so it skips this cache as well
+        # as crawl4ai's own
+        use_cache = self._cache is not None and not bypass_cache
+        if use_cache:
+            # Every argument that changes the extracted content is part of the key
+            cache_key = make_key(
+                url=url,
+                ignore_links=ignore_links,
+                use_pruning=use_pruning,
+                bm25_query=bm25_query,
+                include_html=include_html,
+            )
+            cached_result = self._cache.get(cache_key)
+            if cached_result is not None:
+                return cached_result
+
         result = _fetch_markdown_sync(
             url=url,
             query=bm25_query,
@@ -293,4 +385,7 @@ class Crawl4AIFetchTool(Tool):
             content,
         ]
 
-        return "\n".join(formatted_output)
+        output = "\n".join(formatted_output)
+        if use_cache:
+            self._cache.set(cache_key, output)
+        return output
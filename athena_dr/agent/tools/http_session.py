@@ -0,0 +1,49 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Tools run concurrently across agent workers and tool threads, so keep enough
+# pooled keep-alive connections per host for all of them to reuse.
+POOL_CONNECTIONS = 32
+POOL_MAXSIZE = 64
+
+# Longest wait honoured from a Retry-After header, so a single 429 can't stall
+# a tool thread for minutes
+MAX_RETRY_AFTER = 10
+
+
+class _BoundedRetry(Retry):
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, MAX_RETRY_AFTER)
+
+
+# Retry idempotent requests on connection errors and transient upstream
+# statuses; 429 responses honour the server's Retry-After header up to
+# MAX_RETRY_AFTER seconds. Once the retries are used up the last response is
+# returned to the caller as before.
+RETRY = _BoundedRetry(
+    total=2,
+    backoff_factor=0.2,
+    status_forcelist=(429, 502, 503, 504),
+    raise_on_status=False,
+)
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=RETRY,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Process-wide session shared by all tools so TCP connections and TLS
+# handshakes are reused across calls instead of being set up per request.
+SESSION = _build_session()
@@ -1,11 +1,14 @@
 import os
 from typing import Optional
 
-import requests
 import weave
 from pydantic import BaseModel, Field
 from smolagents import Tool
 
+from athena_dr.agent.cache import DiskCache, TTLCache, make_key
+from athena_dr.agent.tools.http_session import SESSION
+from athena_dr.utils import json_loads
+
 
 class JinaMetadata(BaseModel):
     lang: Optional[str] = None
@@ -55,7 +58,7 @@ def _fetch_webpage_content_jina(
     }
 
     try:
-        response = requests.get(jina_url, headers=headers, timeout=timeout)
+        response = SESSION.get(jina_url, headers=headers, timeout=timeout)
 
         if response.status_code != 200:
             return JinaWebpageResponse(
@@ -64,17 +67,19 @@ def _fetch_webpage_content_jina(
                 error=f"API request failed with status {response.status_code}: {response.text}",
             )
 
-        json_response = response.json()
+        json_response = json_loads(response.content)
         data = json_response.get("data", {})
 
+        # Every successful fetch goes through here, so validation is skipped;
+        # the formatting in JinaFetchTool tolerates missing or null fields
         metadata_dict = data.get("metadata", {})
-        metadata = JinaMetadata(
+        metadata = JinaMetadata.model_construct(
             lang=metadata_dict.get("lang"),
             viewport=metadata_dict.get("viewport"),
         )
 
-        return JinaWebpageResponse(
-            url=data.get("url", url),
+        return JinaWebpageResponse.model_construct(
+            url=data.get("url") or url,
             title=data.get("title", ""),
             content=data.get("content", ""),
             description=data.get("description", ""),
@@ -115,6 +120,23 @@ class JinaFetchTool(Tool):
     }
     output_type = "string"
 
+    def __init__(
+        self,
+        *args,
+        use_cache: bool = True,
+        cache: TTLCache | DiskCache | None = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        # Agents often reopen the same page within a run and across workers.
+        # Pass a DiskCache to keep pages across processes
+        if not use_cache:
+            self._cache = None
+        elif cache is not None:
+            self._cache = cache
+        else:
+            self._cache = TTLCache(max_size=128, ttl=3600)
+
     @weave.op
     def forward(
         self,
@@ -123,6 +145,12 @@ class JinaFetchTool(Tool):
     ) -> str:
         import hashlib
 
+        if self._cache is not None:
+            cache_key = make_key(url=webpage_url)
+            cached_result = self._cache.get(cache_key)
+            if cached_result is not None:
+                return cached_result
+
         result = _fetch_webpage_content_jina(
             url=webpage_url,
             api_key=None,
@@ -153,4 +181,7 @@ class JinaFetchTool(Tool):
             result.content if result.content else "No content extracted."
         )
 
-        return "\n".join(formatted_output)
+        output = "\n".join(formatted_output)
+        if self._cache is not None:
+            self._cache.set(cache_key, output)
+        return output
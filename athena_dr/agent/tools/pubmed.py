@@ -1,14 +1,23 @@
+import contextvars
 import os
+from concurrent.futures import ThreadPoolExecutor
 from xml.etree import ElementTree
 
 import weave
 from smolagents import Tool
 
+from athena_dr.agent.cache import DiskCache, TTLCache, make_key
+from athena_dr.agent.tools.http_session import SESSION
+from athena_dr.utils import json_loads
+
 S2_API_KEY = os.getenv("S2_API_KEY")
 TIMEOUT = int(os.getenv("S2_API_TIMEOUT", 10))
 S2_GRAPH_API_URL = "https://api.semanticscholar.org/graph/v1"
 S2_PAPER_SEARCH_FIELDS = "paperId,corpusId,url,title,abstract,authors,authors.name,year,venue,citationCount,openAccessPdf,externalIds,isOpenAccess"
 PUBMED_BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+EFETCH_BATCH_SIZE = 200
+# NCBI allows 3 requests per second without an API key
+EFETCH_MAX_WORKERS = 3
 
 
 def extract_all_text(tag: ElementTree.Element) -> str:
@@ -25,13 +34,13 @@ def extract_all_text(tag: ElementTree.Element) -> str:
     And tag.text will return None.
 
     This function will extract all text from the tag, including rich text.
+    The fragments are joined as they appear in the document, so markup inside
+    a word such as H<sub>2</sub>O does not split it.
     """
-    return " ".join([_.strip() for _ in tag.itertext()])
+    return "".join(tag.itertext()).strip()
 
 
 def search_pubmed_with_keywords(keywords: str, offset: int = 0, limit: int = 10):
-    import requests
-
     search_url = f"{PUBMED_BASE_URL}/esearch.fcgi"
     params = {
         "db": "pubmed",
@@ -42,7 +51,7 @@ def search_pubmed_with_keywords(keywords: str, offset: int = 0, limit: int = 10)
         "sort": "relevance",
         "email": "your_email@example.com",
     }
-    response = requests.get(search_url, params=params)
+    response = SESSION.get(search_url, params=params, timeout=TIMEOUT)
     root = ElementTree.fromstring(response.content)
     id_list = [id_elem.text for id_elem in root.findall("./IdList/Id")]
     return {
@@ -55,8 +64,24 @@ def search_pubmed_with_keywords(keywords: str, offset: int = 0, limit: int = 10)
 
 
 def fetch_pubmed_details(id_list):
-    import requests
+    # Long ID lists are split into batches of at most 200, which NCBI accepts
+    # as GET requests, so each batch keeps the session's retries on 429 and
+    # 5xx responses; the batches are fetched concurrently
+    batches = [
+        id_list[start : start + EFETCH_BATCH_SIZE]
+        for start in range(0, len(id_list), EFETCH_BATCH_SIZE)
+    ]
+    if len(batches) <= 1:
+        return _fetch_pubmed_batch(id_list)
+    with ThreadPoolExecutor(max_workers=EFETCH_MAX_WORKERS) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, _fetch_pubmed_batch, batch)
+            for batch in batches
+        ]
+        return [paper for future in futures for paper in future.result()]
 
+
+def _fetch_pubmed_batch(id_list):
     fetch_url = f"{PUBMED_BASE_URL}/efetch.fcgi"
     params = {
         "db": "pubmed",
@@ -64,88 +89,110 @@ def fetch_pubmed_details(id_list):
         "retmode": "xml",
         "email": "your_email@example.com",
     }
-    response = requests.get(fetch_url, params=params)
-    papers = ElementTree.fromstring(response.content)
-
     paper_data_list = []
-    for paper in papers.findall("./PubmedArticle"):
-        article = paper.find(".//Article")
-        pmid = paper.find(".//PMID").text
-        title = (
-            extract_all_text(article.find(".//ArticleTitle"))
-            if article.find(".//ArticleTitle") is not None
-            else ""
-        )
-
-        abstract = []
-        if article.find(".//Abstract") is not None:
-            for abstract_text in article.findall(".//Abstract/AbstractText"):
-                if abstract_text.attrib.get("Label"):
-                    abstract.append(f"{abstract_text.attrib['Label']}")
-                abstract.append(extract_all_text(abstract_text))
-        abstract = "\n".join(abstract)
-
-        authors = [
-            {
-                "name": f"{author.find('./LastName').text}, {author.find('./ForeName').text}"
+    # Stream the (gzip-encoded) response and handle one <PubmedArticle> at a
+    # time, dropping each from the tree once it has been read instead of
+    # holding the whole document in memory
+    with SESSION.get(
+        fetch_url, params=params, timeout=TIMEOUT, stream=True
+    ) as response:
+        response.raw.decode_content = True
+        events = ElementTree.iterparse(response.raw, events=("start", "end"))
+        _, root = next(events)
+        for event, paper in events:
+            if event != "end" or paper.tag != "PubmedArticle":
+                continue
+            article = paper.find(".//Article")
+            pmid = paper.find(".//PMID").text
+            # One walk over the article, dispatching on tag, instead of a
+            # separate descendant search for every field
+            title_elem = None
+            abstract = []
+            authors = []
+            year = None
+            venue_elem = None
+            article_date = None
+            for elem in article.iter():
+                tag = elem.tag
+                if tag == "ArticleTitle":
+                    if title_elem is None:
+                        title_elem = elem
+                elif tag == "Abstract":
+                    for abstract_text in elem.findall("AbstractText"):
+                        if abstract_text.attrib.get("Label"):
+                            abstract.append(f"{abstract_text.attrib['Label']}")
+                        abstract.append(extract_all_text(abstract_text))
+                elif tag == "Author":
+                    last_name = elem.find("LastName")
+                    fore_name = elem.find("ForeName")
+                    if last_name is not None and fore_name is not None:
+                        authors.append({"name": f"{last_name.text}, {fore_name.text}"})
+                elif tag == "Journal":
+                    if year is None:
+                        year = elem.find("JournalIssue/PubDate/Year")
+                    if venue_elem is None:
+                        venue_elem = elem.find("Title")
+                elif tag == "ArticleDate":
+                    if article_date is None:
+                        article_date = elem
+
+            title = extract_all_text(title_elem) if title_elem is not None else ""
+            abstract = "\n".join(abstract)
+            venue = venue_elem.text if venue_elem is not None else None
+            publication_date = None
+            if article_date is not None:
+                publication_date = article_date.find("Year").text
+
+            paper_data = {
+                "paperId": pmid,
+                "url": f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
+                "externalIds": {"PubMed": pmid},
+                "title": title,
+                "authors": authors,
+                "abstract": abstract,
+                "year": year.text if year is not None else None,
+                "venue": venue,
+                "publicationDate": publication_date,
             }
-            for author in article.findall(".//Author")
-            if author.find("./LastName") is not None
-            and author.find("./ForeName") is not None
-        ]
-        year = article.find(".//Journal/JournalIssue/PubDate/Year")
-        venue = (
-            article.find(".//Journal/Title").text
-            if article.find(".//Journal/Title") is not None
-            else None
-        )
-        article_dates = article.findall(".//ArticleDate")
-
-        publication_date = None
-        if article_dates:
-            publication_date = article_dates[0].find("Year").text
-
-        paper_data = {
-            "paperId": pmid,
-            "url": f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
-            "externalIds": {"PubMed": pmid},
-            "title": title,
-            "authors": authors,
-            "abstract": abstract,
-            "year": year.text if year is not None else None,
-            "venue": venue,
-            "publicationDate": publication_date,
-        }
-        paper_data_list.append(paper_data)
+            paper_data_list.append(paper_data)
+            root.clear()
     return paper_data_list
 
 
-def fetch_semantic_scholar_details(paper_data):
-    import requests
-
-    paper_ids = [f"PMID:{paper['externalIds']['PubMed']}" for paper in paper_data]
+def fetch_semantic_scholar_details(pmids):
+    """
+    Fetch Semantic Scholar metadata for the given PubMed IDs, keyed by PMID.
 
+    Only the IDs are needed, so this can run while the PubMed details are
+    still being fetched. Returns None if the request fails.
+    """
     try:
-        res = requests.post(
+        res = SESSION.post(
             f"{S2_GRAPH_API_URL}/paper/batch",
             params={"fields": S2_PAPER_SEARCH_FIELDS},
-            json={"ids": paper_ids},
+            json={"ids": [f"PMID:{pmid}" for pmid in pmids]},
             headers={"x-api-key": S2_API_KEY} if S2_API_KEY else None,
             timeout=TIMEOUT,
         )
-        results = res.json()
-
-        for idx in range(len(paper_data)):
-            semantic_scholar_data = results[idx]
-            if semantic_scholar_data:
-                for key in semantic_scholar_data.keys():
-                    if key not in paper_data[idx]:
-                        paper_data[idx][key] = semantic_scholar_data[key]
+        results = json_loads(res.content)
+        if not isinstance(results, list):
+            raise ValueError(f"Unexpected response: {results}")
+        return {pmid: data for pmid, data in zip(pmids, results) if data}
     except Exception as e:
-        for paper in paper_data:
-            paper.update({"citationCount": None})
         print(f"Error fetching data from Semantic Scholar: {e}")
+        return None
 
+
+def merge_semantic_scholar_details(paper_data, semantic_scholar_details):
+    for paper in paper_data:
+        if semantic_scholar_details is None:
+            paper.update({"citationCount": None})
+            continue
+        semantic_scholar_data = semantic_scholar_details.get(paper["paperId"])
+        if semantic_scholar_data:
+            for key in semantic_scholar_data.keys():
+                if key not in paper:
+                    paper[key] = semantic_scholar_data[key]
     return paper_data
 
 
@@ -185,6 +232,23 @@ class PubMedSearchTool(Tool):
     }
     output_type = "string"
 
+    def __init__(
+        self,
+        *args,
+        use_cache: bool = True,
+        cache: TTLCache | DiskCache | None = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        # A search costs three requests and agents often repeat queries. Pass
+        # a DiskCache to keep results across processes
+        if not use_cache:
+            self._cache = None
+        elif cache is not None:
+            self._cache = cache
+        else:
+            self._cache = TTLCache(max_size=256, ttl=3600)
+
     @weave.op
     def forward(
         self,
@@ -192,14 +256,30 @@ class PubMedSearchTool(Tool):
         limit: int = 10,
         offset: int = 0,
     ) -> str:
+        if self._cache is not None:
+            cache_key = make_key(query=query, limit=limit, offset=offset)
+            cached_result = self._cache.get(cache_key)
+            if cached_result is not None:
+                return cached_result
+
         searchStat = search_pubmed_with_keywords(query, offset=offset, limit=limit)
         ids = searchStat["ids"]
 
         if not ids:
             return f"No papers found. Total results: {searchStat['count']}"
 
-        paper_data = fetch_pubmed_details(ids)
-        paper_data = fetch_semantic_scholar_details(paper_data)
+        # The Semantic Scholar lookup only needs the PMIDs, so run it
+        # alongside the PubMed fetch instead of after it; the copied context
+        # keeps it nested under this call in the weave trace.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            semantic_scholar_future = executor.submit(
+                contextvars.copy_context().run, fetch_semantic_scholar_details, ids
+            )
+            paper_data = fetch_pubmed_details(ids)
+            semantic_scholar_details = semantic_scholar_future.result()
+            paper_data = merge_semantic_scholar_details(
+                paper_data, semantic_scholar_details
+            )
 
         # Format output with snippet IDs for citation
         formatted_papers = []
@@ -234,4 +314,8 @@ class PubMedSearchTool(Tool):
             return "No papers found matching the query."
 
         header = f"Found {searchStat['count']} total results. Showing {len(formatted_papers)} papers:\n\n"
-        return header + "\n".join(formatted_papers)
+        result = header + "\n".join(formatted_papers)
+        # Results without citation counts are retried on the next call
+        if self._cache is not None and semantic_scholar_details is not None:
+            self._cache.set(cache_key, result)
+        return result
@@ -4,6 +4,9 @@ from typing import Optional
 import weave
 from smolagents import Tool
 
+from athena_dr.agent.tools.http_session import SESSION
+from athena_dr.utils import json_loads
+
 S2_API_KEY = os.getenv("S2_API_KEY")
 TIMEOUT = int(os.getenv("S2_API_TIMEOUT", 10))
 S2_GRAPH_API_URL = "https://api.semanticscholar.org/graph/v1"
@@ -67,8 +70,6 @@ class SemanticScholarPaperSearchTool(Tool):
         venue: Optional[str] = None,
         limit: int = 25,
     ) -> str:
-        import requests
-
         # Build query parameters
         params = {
             "query": query,
@@ -89,7 +90,7 @@ class SemanticScholarPaperSearchTool(Tool):
         # Make API request
         headers = {"x-api-key": S2_API_KEY} if S2_API_KEY else None
 
-        res = requests.get(
+        res = SESSION.get(
             f"{S2_GRAPH_API_URL}/paper/search",
             params=params,
             headers=headers,
@@ -97,7 +98,7 @@ class SemanticScholarPaperSearchTool(Tool):
         )
 
         res.raise_for_status()
-        results = res.json()
+        results = json_loads(res.content)
 
         # Construct PDF links for ArXiv and ACL papers if not provided
         if "data" in results:
@@ -206,8 +207,6 @@ class SemanticScholarSnippetSearchTool(Tool):
         venue: Optional[str] = None,
         limit: int = 10,
     ) -> str:
-        import requests
-
         # Build query parameters
         params = {
             "query": query,
@@ -226,7 +225,7 @@ class SemanticScholarSnippetSearchTool(Tool):
         # Make API request
         headers = {"x-api-key": S2_API_KEY} if S2_API_KEY else None
 
-        res = requests.get(
+        res = SESSION.get(
             f"{S2_GRAPH_API_URL}/snippet/search",
             params=params,
             headers=headers,
@@ -234,7 +233,7 @@ class SemanticScholarSnippetSearchTool(Tool):
         )
 
         res.raise_for_status()
-        results = res.json()
+        results = json_loads(res.content)
 
         # Format output with snippet IDs for citation
         formatted_snippets = []
@@ -1,10 +1,14 @@
-import json
 import os
 
-import requests
 import weave
 from smolagents import Tool
 
+from athena_dr.agent.cache import DiskCache, TTLCache
+from athena_dr.agent.tools.http_session import SESSION
+from athena_dr.utils import json_dumps
+
+TIMEOUT = int(os.getenv("SERPER_API_TIMEOUT", 30))
+
 
 class SerperSearchTool(Tool):
     name = "serper_search_tool"
@@ -20,19 +24,41 @@ class SerperSearchTool(Tool):
     }
     output_type = "string"
 
-    def __init__(self, *args, **kwargs):
+    def __init__(
+        self,
+        *args,
+        use_cache: bool = True,
+        cache: TTLCache | DiskCache | None = None,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
         self.base_url = "https://google.serper.dev/search"
+        # Agents across runs and workers often repeat the same query, and
+        # results barely change within a few minutes. Pass a DiskCache to keep
+        # results across processes
+        if not use_cache:
+            self._cache = None
+        elif cache is not None:
+            self._cache = cache
+        else:
+            self._cache = TTLCache(max_size=256, ttl=600)
 
     @weave.op
     def forward(self, query: str) -> str:
-        payload = json.dumps({"q": query})
+        if self._cache is not None:
+            cached_result = self._cache.get(query)
+            if cached_result is not None:
+                return cached_result
+
+        # Read the key on every call so one loaded or rotated after the tool
+        # was built is picked up
         headers = {
             "X-API-KEY": os.getenv("SERPER_API_KEY"),
             "Content-Type": "application/json",
         }
-        response = requests.request(
-            "POST", self.base_url, headers=headers, data=payload
+        payload = json_dumps({"q": query})
+        response = SESSION.post(
+            self.base_url, headers=headers, data=payload, timeout=TIMEOUT
         )
         data = response.json()
 
@@ -77,6 +103,10 @@ class SerperSearchTool(Tool):
                     f"Snippet: {result.get('snippet', 'N/A')}\n"
                 )
 
-        return (
+        result = (
             "\n".join(formatted_results) if formatted_results else "No results found."
         )
+        # Error responses are formatted as "No results found." and must not stick
+        if self._cache is not None and response.ok:
+            self._cache.set(query, result)
+        return result
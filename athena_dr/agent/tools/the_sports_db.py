@@ -1,11 +1,45 @@
+import contextvars
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import Literal
 from urllib.parse import quote
 
-import requests
 import weave
 from smolagents import Tool
-from tqdm.auto import tqdm
+
+from athena_dr.agent.tools.http_session import SESSION
+
+# Detail lookups to run for each ID field of a search result, keyed by the
+# field name they are stored under in the enriched result
+LOOKUP_FIELDS = {
+    "idPlayer": {
+        "details": "player",
+        "contracts": "player_contracts",
+        "results": "player_results",
+        "honours": "player_honours",
+        "milestones": "player_milestones",
+        "teams": "player_teams",
+    },
+    "idTeam": {
+        "details": "team",
+        "equipment": "team_equipment",
+    },
+    "idLeague": {
+        "details": "league",
+    },
+    "idEvent": {
+        "details": "event",
+        "lineup": "event_lineup",
+        "results": "event_results",
+        "stats": "event_stats",
+        "timeline": "event_timeline",
+        "tv": "event_tv",
+        "highlights": "event_highlights",
+    },
+    "idVenue": {
+        "details": "venue",
+    },
+}
 
 
 class TheSportsDBSearchTool(Tool):
@@ -36,9 +70,10 @@ class TheSportsDBSearchTool(Tool):
     }
     output_type = "string"
 
-    def __init__(self, *args, **kwargs) -> None:
+    def __init__(self, *args, max_lookup_threads: int = 8, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.base_url = "https://www.thesportsdb.com/api/v2/json"
+        self.max_lookup_threads = max_lookup_threads
 
     @weave.op
     def thesportsdb_lookup(
@@ -72,7 +107,7 @@ class TheSportsDBSearchTool(Tool):
             "X-API-KEY": os.getenv("SPORTSDB_API_KEY"),
             "Accept": "application/json",
         }
-        resp = requests.get(url, headers=headers)
+        resp = SESSION.get(url, headers=headers)
         resp.raise_for_status()
         data = resp.json()
         results = data.get("lookup")
@@ -91,105 +126,33 @@ class TheSportsDBSearchTool(Tool):
             "X-API-KEY": os.getenv("SPORTSDB_API_KEY"),
             "Accept": "application/json",
         }
-        resp = requests.get(url, headers=headers)
+        resp = SESSION.get(url, headers=headers)
         resp.raise_for_status()
         data = resp.json()
         search_results = data.get("search")
         search_results = search_results if isinstance(search_results, list) else []
-        for result_index, result in tqdm(
-            enumerate(search_results),
-            total=len(search_results),
-            desc="Processing search results",
-        ):
-            for key, value in result.items():
-                if key == "idPlayer":
-                    player_details = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="player"
-                    )
-                    player_contracts = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="player_contracts"
-                    )
-                    player_results = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="player_results"
-                    )
-                    player_honours = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="player_honours"
-                    )
-                    player_milestones = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="player_milestones"
-                    )
-                    player_teams = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="player_teams"
-                    )
-                    search_results[result_index][key] = {
-                        "id": value,
-                        "details": player_details,
-                        "contracts": player_contracts,
-                        "results": player_results,
-                        "honours": player_honours,
-                        "milestones": player_milestones,
-                        "teams": player_teams,
-                    }
-                elif key == "idTeam":
-                    team_details = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="team"
-                    )
-                    team_equipment = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="team_equipment"
-                    )
-                    search_results[result_index][key] = {
-                        "id": value,
-                        "details": team_details,
-                        "equipment": team_equipment,
-                    }
-                elif key == "idLeague":
-                    league_details = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="league"
-                    )
-                    search_results[result_index][key] = {
-                        "id": value,
-                        "details": league_details,
-                    }
-                elif key == "idEvent":
-                    event_details = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="event"
-                    )
-                    event_lineup = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="event_lineup"
-                    )
-                    event_results = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="event_results"
-                    )
-                    event_stats = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="event_stats"
-                    )
-                    event_timeline = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="event_timeline"
-                    )
-                    event_tv = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="event_tv"
-                    )
-                    event_highlights = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="event_highlights"
-                    )
-                    search_results[result_index][key] = {
-                        "id": value,
-                        "details": event_details,
-                        "lineup": event_lineup,
-                        "results": event_results,
-                        "stats": event_stats,
-                        "timeline": event_timeline,
-                        "tv": event_tv,
-                        "highlights": event_highlights,
-                    }
-                elif key == "idVenue":
-                    venue_details = self.thesportsdb_lookup(
-                        lookup_id=value, lookup_type="venue"
-                    )
-                    search_results[result_index][key] = {
-                        "id": value,
-                        "details": venue_details,
-                    }
+
+        # Run every detail lookup concurrently instead of one round trip at a
+        # time; each lookup runs in a copy of the current context so it stays
+        # nested under this call in the weave trace.
+        with ThreadPoolExecutor(max_workers=self.max_lookup_threads) as executor:
+            lookups = {
+                (result_index, key, field): executor.submit(
+                    contextvars.copy_context().run,
+                    self.thesportsdb_lookup,
+                    lookup_id=value,
+                    lookup_type=lookup_type,
+                )
+                for result_index, result in enumerate(search_results)
+                for key, value in result.items()
+                if key in LOOKUP_FIELDS
+                for field, lookup_type in LOOKUP_FIELDS[key].items()
+            }
+            for (result_index, key, field), future in lookups.items():
+                result = search_results[result_index]
+                if not isinstance(result[key], dict):
+                    result[key] = {"id": result[key]}
+                result[key][field] = future.result()
 
         # Format output with snippet IDs for citation
         formatted_results = []
@@ -1,8 +1,15 @@
+import json
 import os
 from dataclasses import dataclass
+from typing import Any
 
 from omegaconf import OmegaConf
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
 
 @dataclass
 class WorkflowConfig:
@@ -16,6 +23,22 @@ class WorkflowConfig:
     max_output_tokens: int = 30000
     max_tool_threads: int = 5
     max_agent_workers: int = 5
+    prompt_cache_control: bool = False
+    enable_semantic_cache: bool = False
+    # Cosine similarity for a semantic cache hit. Queries must also share their
+    # numbers and names; lowering this still risks answering a paraphrase
+    # that asks for something else
+    semantic_cache_threshold: float = 0.92
+    enable_query_routing: bool = False
+    memory_window: int | None = None
+    enable_response_cache: bool = False
+    enable_llm_cache: bool = False
+    enable_disk_cache: bool = False
+    cache_dir: str = "~/.cache/athena_dr"
+    # Seconds before entries of the persistent response and LLM caches expire
+    cache_ttl: float = 24 * 3600
+    max_failure_rate: float = 0.5
+    failure_rate_min_samples: int = 20
 
 
 def get_config(config_path: os.PathLike) -> WorkflowConfig:
@@ -23,3 +46,23 @@ def get_config(config_path: os.PathLike) -> WorkflowConfig:
     resolved_dict = OmegaConf.to_container(yaml_conf, resolve=True)
     config = WorkflowConfig(**resolved_dict)
     return config
+
+
+def json_dumps(obj: Any) -> str:
+    """Serialize obj to a JSON string, using orjson when it is installed."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            ).decode()
+        except TypeError:
+            # orjson rejects ints wider than 64 bits; the stdlib encoder does not
+            pass
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def json_loads(data: str | bytes) -> Any:
+    """Parse a JSON document, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,154 @@
+import sqlite3
+import threading
+
+import pytest
+
+from athena_dr.agent import cache as cache_module
+from athena_dr.agent.cache import DiskCache, TTLCache
+
+
+class FakeClock:
+    """Replaces the time module in athena_dr.agent.cache."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+def row_count(path) -> int:
+    with sqlite3.connect(path) as connection:
+        return connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+def test_ttl_cache_expires_entries(clock):
+    cache = TTLCache(ttl=10)
+    cache.set("a", 1)
+
+    clock.advance(9)
+    assert cache.get("a") == 1
+    clock.advance(1)
+    assert cache.get("a") is None
+    assert "a" not in cache._entries
+
+
+def test_ttl_cache_without_ttl_keeps_entries(clock):
+    cache = TTLCache(ttl=None)
+    cache.set("a", 1)
+    clock.advance(10**9)
+    assert cache.get("a") == 1
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # Reading a makes b the least recently used entry
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_overwrite_refreshes_expiry_and_order(clock):
+    cache = TTLCache(max_size=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    clock.advance(5)
+    cache.set("a", 10)
+    cache.set("c", 3)
+
+    clock.advance(6)
+    assert cache.get("a") == 10
+    assert cache.get("b") is None
+
+
+def test_disk_cache_round_trip_and_reopen(tmp_path):
+    path = tmp_path / "nested" / "cache.sqlite"
+    value = {"results": [{"title": "t", "score": 1.5}], "ok": True}
+
+    cache = DiskCache(str(path))
+    assert cache.get("key") is None
+    cache.set("key", value)
+    assert cache.get("key") == value
+    assert DiskCache(str(path)).get("key") == value
+
+
+def test_disk_cache_expires_entries(tmp_path, clock):
+    cache = DiskCache(str(tmp_path / "cache.sqlite"), ttl=10)
+    cache.set("a", 1)
+
+    clock.advance(9)
+    assert cache.get("a") == 1
+    clock.advance(1)
+    assert cache.get("a") is None
+
+
+def test_disk_cache_purges_expired_rows_on_open(tmp_path, clock):
+    path = tmp_path / "cache.sqlite"
+    cache = DiskCache(str(path), ttl=10)
+    cache.set("old", 1)
+    DiskCache(str(path), ttl=None).set("kept", 2)
+
+    clock.advance(10)
+    assert row_count(path) == 2
+    DiskCache(str(path), ttl=10)
+    assert row_count(path) == 1
+
+
+def test_disk_cache_purges_expired_rows_every_purge_interval_writes(tmp_path, clock):
+    path = tmp_path / "cache.sqlite"
+    cache = DiskCache(str(path), ttl=10, purge_interval=3)
+    cache.set("old", 1)
+    clock.advance(10)
+
+    cache.set("b", 2)
+    assert row_count(path) == 2
+    # The third write purges the expired row before it can pile up
+    cache.set("c", 3)
+    assert row_count(path) == 2
+    assert cache.get("b") == 2
+
+
+def test_disk_cache_file_shared_by_two_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first = DiskCache(path)
+    second = DiskCache(path)
+
+    first.set("a", 1)
+    assert second.get("a") == 1
+    second.set("a", 2)
+    assert first.get("a") == 2
+
+    def write(cache: DiskCache, prefix: str) -> None:
+        for i in range(50):
+            cache.set(f"{prefix}{i}", i)
+
+    threads = [
+        threading.Thread(target=write, args=(cache, prefix))
+        for cache, prefix in ((first, "x"), (second, "y"))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert row_count(path) == 101
+    assert first.get("y49") == 49
+    assert second.get("x49") == 49
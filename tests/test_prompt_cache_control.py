@@ -0,0 +1,92 @@
+import copy
+import hashlib
+import json
+
+import pytest
+from smolagents import ChatMessage, MessageRole
+
+from athena_dr.agent.model import OpenAIModelWithThinkingTraces
+
+SYSTEM_PROMPT = "You are a research assistant. Cite every claim."
+
+
+@pytest.fixture(scope="module")
+def model() -> OpenAIModelWithThinkingTraces:
+    return OpenAIModelWithThinkingTraces(
+        model_id="test-model", api_key="test", prompt_cache_control=True
+    )
+
+
+def prefix_hash(message: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(message, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+@pytest.mark.parametrize(
+    "system_content",
+    [
+        pytest.param(SYSTEM_PROMPT, id="str"),
+        pytest.param([{"type": "text", "text": SYSTEM_PROMPT}], id="list"),
+        pytest.param(
+            [
+                {"type": "text", "text": SYSTEM_PROMPT},
+                {"type": "text", "text": "Tools: search, fetch."},
+            ],
+            id="list-several-parts",
+        ),
+    ],
+)
+def test_static_prefix_is_stable_across_calls(model, system_content):
+    hashes = set()
+    for step in range(100):
+        messages = [
+            ChatMessage(role=MessageRole.SYSTEM, content=copy.deepcopy(system_content)),
+            ChatMessage(role=MessageRole.USER, content=f"step {step}"),
+        ]
+        snapshot = copy.deepcopy(messages)
+
+        completion_kwargs = model._prepare_completion_kwargs(messages=messages)
+
+        assert messages == snapshot
+        system = completion_kwargs["messages"][0]
+        marked = ["cache_control" in part for part in system["content"]]
+        assert marked == [False] * (len(marked) - 1) + [True]
+        hashes.add(prefix_hash(system))
+    assert len(hashes) == 1
+
+
+@pytest.mark.parametrize(
+    "system_content",
+    [
+        pytest.param(SYSTEM_PROMPT, id="str"),
+        pytest.param([{"type": "text", "text": SYSTEM_PROMPT}], id="list"),
+    ],
+)
+def test_mark_static_prefix_leaves_the_input_alone(system_content):
+    system = {"role": "system", "content": system_content}
+    snapshot = copy.deepcopy(system)
+    messages = [system, {"role": "user", "content": "hi"}]
+
+    OpenAIModelWithThinkingTraces._mark_static_prefix(messages)
+
+    assert system == snapshot
+    assert messages[0]["content"][-1] == {
+        "type": "text",
+        "text": SYSTEM_PROMPT,
+        "cache_control": {"type": "ephemeral"},
+    }
+
+
+@pytest.mark.parametrize(
+    "messages",
+    [
+        pytest.param([], id="empty"),
+        pytest.param([{"role": "user", "content": "hi"}], id="no-system"),
+        pytest.param([{"role": "system", "content": []}], id="empty-system"),
+    ],
+)
+def test_mark_static_prefix_without_a_system_prompt(messages):
+    snapshot = copy.deepcopy(messages)
+    OpenAIModelWithThinkingTraces._mark_static_prefix(messages)
+    assert messages == snapshot
@@ -0,0 +1,136 @@
+import io
+import json
+from pathlib import Path
+from xml.etree import ElementTree
+
+import pytest
+
+from athena_dr.agent.tools import pubmed
+
+EFETCH_XML = (Path(__file__).parent / "fixtures" / "pubmed_efetch.xml").read_bytes()
+
+
+class FakeResponse:
+    def __init__(self, content: bytes):
+        self.content = content
+        self.raw = io.BytesIO(content)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class FakeSession:
+    """Serves the efetch fixture, restricted to the requested PMIDs."""
+
+    def __init__(self, s2_results=None):
+        self.requested_ids = []
+        self.s2_results = s2_results
+
+    def get(self, url, params=None, **kwargs):
+        ids = params["id"].split(",")
+        self.requested_ids.append(ids)
+        root = ElementTree.fromstring(EFETCH_XML)
+        for article in list(root):
+            if article.find(".//PMID").text not in ids:
+                root.remove(article)
+        return FakeResponse(ElementTree.tostring(root))
+
+    def post(self, url, **kwargs):
+        return FakeResponse(json.dumps(self.s2_results).encode())
+
+
+@pytest.fixture
+def session(monkeypatch) -> FakeSession:
+    session = FakeSession()
+    monkeypatch.setattr(pubmed, "SESSION", session)
+    return session
+
+
+def test_extracted_fields(session):
+    papers = pubmed.fetch_pubmed_details(["39355906", "12345678"])
+
+    assert papers == [
+        {
+            "paperId": "39355906",
+            "url": "https://pubmed.ncbi.nlm.nih.gov/39355906/",
+            "externalIds": {"PubMed": "39355906"},
+            "title": "LRP1 Repression by SNAIL Results in ECM Remodeling in "
+            "Genetic Risk for Vascular Diseases.",
+            # Collective authors have no LastName/ForeName and are skipped
+            "authors": [{"name": "Nguyen, Alex"}, {"name": "García, María José"}],
+            "abstract": "BACKGROUND\n"
+            "Variants near LRP1 are linked to vascular disease.\n"
+            "METHODS\n"
+            "Cells were cultured in H2O2-free medium.",
+            "year": "2024",
+            "venue": "Arteriosclerosis, thrombosis, and vascular biology",
+            "publicationDate": "2024",
+        },
+        {
+            "paperId": "12345678",
+            "url": "https://pubmed.ncbi.nlm.nih.gov/12345678/",
+            "externalIds": {"PubMed": "12345678"},
+            "title": "A plain title.",
+            "authors": [],
+            "abstract": "One unlabeled paragraph.",
+            "year": None,
+            "venue": "Journal of Examples",
+            "publicationDate": None,
+        },
+    ]
+
+
+def test_batches_keep_the_requested_order(session, monkeypatch):
+    monkeypatch.setattr(pubmed, "EFETCH_BATCH_SIZE", 1)
+
+    papers = pubmed.fetch_pubmed_details(["12345678", "39355906"])
+
+    assert [paper["paperId"] for paper in papers] == ["12345678", "39355906"]
+    assert sorted(session.requested_ids) == [["12345678"], ["39355906"]]
+
+
+def test_semantic_scholar_details_are_keyed_by_pmid(session):
+    session.s2_results = [None, {"paperId": "s2-b", "citationCount": 7}]
+
+    details = pubmed.fetch_semantic_scholar_details(["111", "222"])
+
+    assert details == {"222": {"paperId": "s2-b", "citationCount": 7}}
+
+
+def test_semantic_scholar_error_returns_none(session):
+    session.s2_results = {"error": "rate limited"}
+    assert pubmed.fetch_semantic_scholar_details(["111"]) is None
+
+
+def test_merge_is_independent_of_order(session):
+    papers = pubmed.fetch_pubmed_details(["39355906", "12345678"])
+    # Listed in the opposite order to the PubMed results, and S2 fields that
+    # PubMed already has do not overwrite them
+    details = {
+        "12345678": {"paperId": "s2-b", "title": "S2 title", "citationCount": 3},
+        "39355906": {"paperId": "s2-a", "citationCount": 41, "year": 2023},
+    }
+
+    merged = pubmed.merge_semantic_scholar_details(papers, details)
+
+    assert [(paper["paperId"], paper["citationCount"]) for paper in merged] == [
+        ("39355906", 41),
+        ("12345678", 3),
+    ]
+    assert merged[0]["year"] == "2024"
+    assert merged[1]["title"] == "A plain title."
+
+
+def test_merge_without_details(session):
+    papers = pubmed.fetch_pubmed_details(["39355906", "12345678"])
+    partial = pubmed.merge_semantic_scholar_details(
+        [dict(paper) for paper in papers], {"12345678": {"citationCount": 3}}
+    )
+    failed = pubmed.merge_semantic_scholar_details(papers, None)
+
+    assert "citationCount" not in partial[0]
+    assert partial[1]["citationCount"] == 3
+    assert [paper["citationCount"] for paper in failed] == [None, None]
@@ -0,0 +1,27 @@
+import pytest
+
+from athena_dr.agent.deep_research import classify_query
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        pytest.param("2+3", "simple", id="addition"),
+        pytest.param("12 * (4-1)", "simple", id="parentheses"),
+        pytest.param(" 2 ** 10 = ? ", "simple", id="power-with-question"),
+        pytest.param("-5 + 3", "simple", id="leading-sign"),
+        pytest.param("2020-01-01", "complex", id="iso-date"),
+        pytest.param("1/2/2020", "complex", id="slash-date"),
+        pytest.param("31.12.2020", "complex", id="dotted-date"),
+        pytest.param("555-1234", "complex", id="phone"),
+        pytest.param("(555) 123-4567", "complex", id="phone-area-code"),
+        pytest.param("-5", "complex", id="lone-number"),
+        pytest.param("2020", "complex", id="year"),
+        pytest.param(
+            "What was the population of France in 2020?", "complex", id="prose"
+        ),
+        pytest.param("What is 2+3?", "complex", id="prose-with-arithmetic"),
+    ],
+)
+def test_classify_query(query, expected):
+    assert classify_query(query) == expected
@@ -0,0 +1,66 @@
+import sys
+
+import numpy as np
+import pytest
+
+from athena_dr.agent.cache import SemanticCache
+
+CACHED = "Who won the 2018 FIFA World Cup?"
+
+
+class FixedEncoder:
+    """Stands in for the sentence-transformers model with fixed embeddings."""
+
+    def __init__(self, vectors: dict[str, list[float]]):
+        self.vectors = vectors
+
+    def encode(self, text: str, normalize_embeddings: bool = False):
+        vector = np.array(self.vectors[text], dtype=float)
+        return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def cache() -> SemanticCache:
+    cache = SemanticCache(threshold=0.92)
+    # The near misses are placed closer to the cached query than the paraphrase
+    cache._encoder = FixedEncoder(
+        {
+            CACHED: [1.0, 0.0, 0.0],
+            "Which team won the FIFA World Cup in 2018?": [1.0, 0.3, 0.0],
+            "Who won the 2022 FIFA World Cup?": [1.0, 0.0, 0.1],
+            "Who won the 2018 UEFA Champions League?": [1.0, 0.1, 0.1],
+            "What is the boiling point of water?": [0.0, 0.0, 1.0],
+        }
+    )
+    cache.put("short_form", CACHED, "France")
+    return cache
+
+
+def test_paraphrase_hits(cache):
+    paraphrase = "Which team won the FIFA World Cup in 2018?"
+    assert cache.get("short_form", paraphrase) == "France"
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        pytest.param("Who won the 2022 FIFA World Cup?", id="different-year"),
+        pytest.param("Who won the 2018 UEFA Champions League?", id="different-name"),
+        pytest.param("What is the boiling point of water?", id="unrelated"),
+    ],
+)
+def test_near_misses_do_not_hit(cache, query):
+    assert cache.get("short_form", query) is None
+
+
+def test_namespaces_are_separate(cache):
+    assert cache.get("long_form", CACHED) is None
+
+
+def test_missing_extra_names_the_install_command(monkeypatch):
+    # A None entry in sys.modules makes the import raise ImportError
+    monkeypatch.setitem(sys.modules, "sentence_transformers", None)
+    cache = SemanticCache()
+
+    with pytest.raises(ImportError, match=r"athena_dr\[semantic-cache\]"):
+        cache.get("short_form", "who won the world cup")
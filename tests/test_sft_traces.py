@@ -0,0 +1,127 @@
+import json
+
+import pytest
+from datasets import Dataset
+
+from athena_dr.agent.deep_research import AnswerType, DeepResearchAgent
+from athena_dr.utils import WorkflowConfig
+
+
+@pytest.fixture
+def agent() -> DeepResearchAgent:
+    config = WorkflowConfig(
+        model_name="test-model",
+        api_key="test",
+        base_url="http://localhost:8000/v1",
+        max_tokens=256,
+        temperature=0.0,
+        agent_max_steps=1,
+        agent_name="test",
+        max_agent_workers=2,
+        failure_rate_min_samples=4,
+    )
+    return DeepResearchAgent(config=config)
+
+
+@pytest.fixture
+def dataset() -> Dataset:
+    return Dataset.from_dict(
+        {
+            "question": [f"question {i}" for i in range(20)],
+            "answer": [f"answer {i}" for i in range(20)],
+        }
+    )
+
+
+def fake_result(query: str) -> dict:
+    return {
+        "final_result": f"result for {query}",
+        "trace": [],
+        "tool_calls": [],
+        "total_tool_calls": 0,
+        "total_input_tokens": 10,
+        "total_output_tokens": 5,
+        "total_cached_tokens": 0,
+        "tool_calling_errors": 0,
+        "urls_used": [],
+        "cited_ids_in_answer": [],
+        "citations_used": {},
+    }
+
+
+def test_failure_cutoff_raises_without_pushing(agent, dataset, monkeypatch, tmp_path):
+    predicted = []
+
+    def predict(self, query, answer_type):
+        predicted.append(query)
+        raise ValueError("backend is down")
+
+    pushed = []
+    monkeypatch.setattr(DeepResearchAgent, "predict", predict)
+    monkeypatch.setattr(
+        Dataset, "push_to_hub", lambda *args, **kwargs: pushed.append(1)
+    )
+    output_path = tmp_path / "traces.jsonl"
+
+    with pytest.raises(RuntimeError, match="pass it as output_path to resume"):
+        agent.generate_sft_traces(
+            dataset,
+            AnswerType.SHORT,
+            prompt_column="question",
+            answer_column="answer",
+            dataset_name="org/traces",
+            output_path=str(output_path),
+        )
+
+    assert not pushed
+    # Only the rows already in flight when the cutoff hit were run
+    assert len(predicted) < len(dataset)
+    assert output_path.exists()
+
+
+def test_resume_skips_recorded_prompts(agent, dataset, monkeypatch, tmp_path):
+    output_path = tmp_path / "traces.jsonl"
+    with open(output_path, "w", encoding="utf-8") as fh:
+        for i in range(5):
+            result = fake_result(f"question {i}")
+            row = {
+                "prompt": f"question {i}",
+                "original_answer": f"answer {i}",
+                "answer": "earlier run",
+                "conversations": result["trace"],
+                **{
+                    key: value
+                    for key, value in result.items()
+                    if key not in ("final_result", "trace")
+                },
+            }
+            fh.write(json.dumps(row) + "\n")
+
+    predicted = []
+
+    def predict(self, query, answer_type):
+        predicted.append(query)
+        return fake_result(query)
+
+    monkeypatch.setattr(DeepResearchAgent, "predict", predict)
+    traces = agent.generate_sft_traces(
+        dataset,
+        AnswerType.SHORT,
+        prompt_column="question",
+        answer_column="answer",
+        output_path=str(output_path),
+    )
+
+    assert sorted(predicted) == sorted(f"question {i}" for i in range(5, 20))
+    assert len(traces) == 20
+    assert [trace["answer"] for trace in traces[:5]] == ["earlier run"] * 5
+    # A second run over the same file has nothing left to do
+    predicted.clear()
+    agent.generate_sft_traces(
+        dataset,
+        AnswerType.SHORT,
+        prompt_column="question",
+        answer_column="answer",
+        output_path=str(output_path),
+    )
+    assert predicted == []
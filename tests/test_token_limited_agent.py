@@ -0,0 +1,94 @@
+import pytest
+from smolagents import ActionStep, ChatMessage, MessageRole, Model, TokenUsage
+from smolagents.monitoring import Timing
+
+from athena_dr.agent.token_limited_agent import TokenLimitedToolCallingAgent
+
+
+class SummaryModel(Model):
+    """Answers every call with the same short summary and fixed usage."""
+
+    def __init__(self):
+        super().__init__(model_id="stub")
+        self.calls = 0
+
+    def generate(self, messages, **kwargs):
+        self.calls += 1
+        return ChatMessage(
+            role=MessageRole.ASSISTANT,
+            content="<thinking>...</thinking>found three sources",
+            token_usage=TokenUsage(input_tokens=100, output_tokens=10),
+        )
+
+
+def count_tokens(messages: list[ChatMessage]) -> int:
+    return sum(
+        len(part["text"].split())
+        for message in messages
+        for part in message.content
+        if part.get("type") == "text"
+    )
+
+
+def run_steps(agent: TokenLimitedToolCallingAgent, steps: int) -> list[int]:
+    """Add fake action steps and return the prompt size before each one."""
+    agent.memory.steps.clear()
+    input_tokens = []
+    for step_number in range(1, steps + 1):
+        input_tokens.append(count_tokens(agent.write_memory_to_messages()))
+        agent.memory.steps.append(
+            ActionStep(
+                step_number=step_number,
+                timing=Timing(start_time=0.0),
+                model_output="thinking about the task " * 20,
+                observations="search result snippet " * 100,
+            )
+        )
+    return input_tokens
+
+
+@pytest.fixture
+def agent() -> TokenLimitedToolCallingAgent:
+    return TokenLimitedToolCallingAgent(
+        tools=[], model=SummaryModel(), memory_window=3, summary_interval=3
+    )
+
+
+def test_windowed_prompt_stops_growing(agent):
+    input_tokens = run_steps(agent, 30)
+
+    # The first six steps are sent verbatim, after that the prompt cycles
+    # between three and five verbatim steps plus the summary
+    assert input_tokens[:6] == sorted(input_tokens[:6])
+    assert input_tokens[9:] == input_tokens[6:-3]
+    assert max(input_tokens[6:]) < 2 * max(input_tokens[:6])
+
+    full_history = count_tokens(agent.write_memory_to_messages(full_history=True))
+    assert full_history > 4 * max(input_tokens)
+
+
+def test_summary_replaces_older_steps(agent):
+    run_steps(agent, 6)
+    messages = agent.write_memory_to_messages()
+
+    texts = [part["text"] for message in messages for part in message.content]
+    assert "Summary of your earlier research steps:\nfound three sources" in texts
+    assert sum("search result snippet" in text for text in texts) == 3
+
+
+def test_summary_usage_counts_towards_the_run(agent):
+    agent.monitor.reset()
+    run_steps(agent, 30)
+
+    assert agent.model.calls == 8
+    assert len(agent.summary_token_usage) == 8
+    assert agent.monitor.total_input_token_count == 800
+    assert agent.monitor.total_output_token_count == 80
+
+
+def test_without_memory_window_every_step_is_kept():
+    agent = TokenLimitedToolCallingAgent(tools=[], model=SummaryModel())
+    input_tokens = run_steps(agent, 10)
+
+    assert input_tokens == sorted(set(input_tokens))
+    assert agent.model.calls == 0
@@ -0,0 +1,252 @@
+import json
+
+import pytest
+
+from athena_dr.agent.model import OpenAIModelWithThinkingTraces, _iter_xml_elements
+
+
+@pytest.fixture(scope="module")
+def model() -> OpenAIModelWithThinkingTraces:
+    # Parsing never talks to the API, so any key will do
+    return OpenAIModelWithThinkingTraces(model_id="test-model", api_key="test")
+
+
+def parse(model: OpenAIModelWithThinkingTraces, content: str):
+    cleaned, tool_calls = model._parse_all_tool_calls(content)
+    calls = [
+        (tool_call.function.name, json.loads(tool_call.function.arguments))
+        for tool_call in tool_calls or ()
+    ]
+    return cleaned, calls
+
+
+@pytest.mark.parametrize(
+    "content, expected_content, expected_calls",
+    [
+        pytest.param(
+            "<tool_call><tool_name>serper_search_tool</tool_name>"
+            "<query>llm agents</query></tool_call>",
+            "",
+            [("serper_search_tool", {"query": "llm agents"})],
+            id="xml",
+        ),
+        pytest.param(
+            "think first\n"
+            "<tool_call><tool_name>semantic_scholar_paper_search</tool_name>"
+            "<query>rag</query><limit>5</limit></tool_call>\n"
+            "<tool_call><tool_name>jina_fetch_webpage_content</tool_name>"
+            "<webpage_url>https://a.b/c?x=1&y=2</webpage_url></tool_call> tail",
+            "think first\n\n tail",
+            [
+                ("semantic_scholar_paper_search", {"query": "rag", "limit": "5"}),
+                (
+                    "jina_fetch_webpage_content",
+                    {"webpage_url": "https://a.b/c?x=1&y=2"},
+                ),
+            ],
+            id="xml-multiple",
+        ),
+        pytest.param(
+            "<tool_call><tool_name>a</tool_name><q>x &amp; y</q></tool_call>",
+            "",
+            [("a", {"q": "x & y"})],
+            id="xml-entities",
+        ),
+        pytest.param(
+            "<tool_call><tool_name>x</tool_name><a>1</a><b><c>2</c></b></tool_call>",
+            "",
+            [("x", {"a": "1", "b": "<c>2</c>"})],
+            id="xml-nested-arg-keeps-markup",
+        ),
+        pytest.param(
+            "<tool_call><tool_name>code_execution_tool</tool_name>"
+            "<code>a = 1\nprint(a)</code></tool_call>",
+            "",
+            [("code_execution_tool", {"code": "a = 1\nprint(a)"})],
+            id="xml-multiline-value",
+        ),
+        pytest.param(
+            '<tool_call><tool_name>x</tool_name><a id="1">v</a><b/><c>w</c>'
+            "</tool_call>",
+            "",
+            [("x", {"c": "w"})],
+            id="xml-attributed-and-self-closing-tags-skipped",
+        ),
+        pytest.param(
+            '<tool_call>semantic_scholar_paper_search\n  "query": "value",\n'
+            '  "limit": 10\n}',
+            "",
+            [("semantic_scholar_paper_search", {"query": "value", "limit": 10})],
+            id="hybrid",
+        ),
+        pytest.param(
+            '<tool_call>pubmed_search\n"query": "cancer", "limit": 3.5, bad}'
+            "</tool_call>",
+            "</tool_call>",
+            [("pubmed_search", {"query": "cancer", "limit": 3.5})],
+            id="hybrid-invalid-json",
+        ),
+        pytest.param(
+            '<tool_call>search_tool\n"query": "q"} Error: something',
+            "Error: something",
+            [("search_tool", {"query": "q"})],
+            id="hybrid-before-error",
+        ),
+        pytest.param(
+            '[TOOL_CALL]\n{tool => "serper_search_tool", args => {\n'
+            '  --query "value with spaces"\n  --limit 10\n}}\n[/TOOL_CALL]',
+            "",
+            [("serper_search_tool", {"query": "value with spaces", "limit": 10})],
+            id="bracket-arrow",
+        ),
+        pytest.param(
+            '[TOOL_CALL]\n{tool => "x", args => {--offset -5 --year 2020-2021 '
+            '--q "a b"}}\n[/TOOL_CALL]',
+            "",
+            [("x", {"offset": -5, "year": "2020-2021", "q": "a b"})],
+            id="bracket-arrow-negative-int",
+        ),
+        pytest.param(
+            '[TOOL_CALL]\n{tool => "x", args => {--year 2020_2025}}\n[/TOOL_CALL]',
+            "",
+            [("x", {"year": "2020_2025"})],
+            id="bracket-arrow-underscore-passthrough",
+        ),
+        pytest.param(
+            "[TOOL_CALL]\n{ 'name': 'pubmed_search', 'args': {\n"
+            "  'query': 'covid',\n  'limit': 10\n}}\n[/TOOL_CALL]",
+            "",
+            [("pubmed_search", {"query": "covid", "limit": 10})],
+            id="bracket-single-quoted",
+        ),
+        pytest.param(
+            "[TOOL_CALL]\n{ 'name': 'pubmed_search', 'args': "
+            "{'query': \"alzheimer's disease\", 'limit': 5}}\n[/TOOL_CALL]",
+            "",
+            [("pubmed_search", {"query": "alzheimer's disease", "limit": 5})],
+            id="bracket-single-quoted-apostrophe",
+        ),
+        pytest.param(
+            '[TOOL_CALL]\n{"name": "serper_search_tool", "args": '
+            '{"query": "it\'s"}}\n[/TOOL_CALL]',
+            "",
+            [("serper_search_tool", {"query": "it's"})],
+            id="bracket-json-apostrophe",
+        ),
+        pytest.param(
+            'Action:\n{\n  "name": "semantic_scholar_paper_search",\n'
+            '  "arguments": {"query": "search terms", "limit": 10}\n}',
+            "",
+            [("semantic_scholar_paper_search", {"query": "search terms", "limit": 10})],
+            id="action",
+        ),
+        pytest.param(
+            'Action: {"name": "serper_search_tool", "arguments": '
+            '{"query": "a", "n": 2.5, "flag": true,}}\n<cite id="x"></cite>---\nmore',
+            "more",
+            [("serper_search_tool", {"query": "a", "n": 2.5, "flag": "true"})],
+            id="action-fallback-and-empty-cite",
+        ),
+        pytest.param(
+            'Action: {"name": "x", "arguments": "{\\"q\\": 1}"}',
+            "",
+            [("x", {"q": 1})],
+            id="action-string-arguments",
+        ),
+        pytest.param(
+            '[Event: {"tool_calls": {"webpage_url": "https://x.y"}}] and '
+            '[Event: {"webpage_url": "https://z.w"}]',
+            "and",
+            [
+                ("crawl4ai_fetch_webpage_content", {"url": "https://x.y"}),
+                ("crawl4ai_fetch_webpage_content", {"url": "https://z.w"}),
+            ],
+            id="event",
+        ),
+        pytest.param(
+            "<invoke><semantic_scholar_paper_search>\n<query>search terms</query>\n"
+            "<year>2020-2025</year>\n<limit>15</limit>\n"
+            "</semantic_scholar_paper_search></invoke>",
+            "",
+            [
+                (
+                    "semantic_scholar_paper_search",
+                    {"query": "search terms", "year": "2020-2025", "limit": 15},
+                )
+            ],
+            id="invoke",
+        ),
+        pytest.param(
+            "<invoke><x><offset>-5</offset><year>2020_2025</year><n>1.5</n>"
+            "</x></invoke>",
+            "",
+            [("x", {"offset": -5, "year": "2020_2025", "n": "1.5"})],
+            id="invoke-negative-int-and-underscore-passthrough",
+        ),
+        pytest.param(
+            "<invoke><x><id>123456789012345678901234</id></x></invoke>",
+            "",
+            [("x", {"id": 123456789012345678901234})],
+            id="invoke-int-wider-than-64-bits",
+        ),
+        pytest.param(
+            "mixed <tool_call><tool_name>a</tool_name><q>1</q></tool_call> then "
+            '[TOOL_CALL]\n{tool => "b", args => {--q 2}}\n[/TOOL_CALL] and '
+            'Action: {"name": "c", "arguments": {"q": 3}} end',
+            "mixed  then  and  end",
+            [("a", {"q": "1"}), ("b", {"q": 2}), ("c", {"q": 3})],
+            id="mixed-formats",
+        ),
+        pytest.param(
+            'Action: {"name": "first", "arguments": {"q": 1}} then '
+            "<tool_call><tool_name>second</tool_name><q>2</q></tool_call>",
+            "then",
+            [("first", {"q": 1}), ("second", {"q": "2"})],
+            id="ordered-by-position",
+        ),
+    ],
+)
+def test_parse_tool_calls(model, content, expected_content, expected_calls):
+    assert parse(model, content) == (expected_content, expected_calls)
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        pytest.param("plain answer no tools", id="no-markers"),
+        pytest.param("Action: no brace here", id="action-without-payload"),
+        pytest.param("[TOOL_CALL] unterminated", id="unterminated-bracket"),
+        pytest.param("[Event: {bad json}]", id="invalid-event"),
+        pytest.param(
+            "[TOOL_CALL]\n{ 'name': 'x', 'args': {'tags': {'a', 'b'}}}\n[/TOOL_CALL]",
+            id="non-json-arguments",
+        ),
+    ],
+)
+def test_content_without_tool_calls_is_unchanged(model, content):
+    assert model._parse_all_tool_calls(content) == (content, None)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        pytest.param("<a>1</a> <b>x\ny</b>", [("a", "1"), ("b", "x\ny")], id="plain"),
+        pytest.param(
+            '<a id="1">v</a><b/><c>w</c>', [("c", "w")], id="attributed-self-closing"
+        ),
+        pytest.param("<a>1<a>2</a>", [("a", "1<a>2")], id="first-closing-tag"),
+        pytest.param("<a>open <b>2</b>", [("b", "2")], id="unclosed"),
+        pytest.param("<a>1</a><", [("a", "1")], id="truncated"),
+    ],
+)
+def test_iter_xml_elements(text, expected):
+    assert list(_iter_xml_elements(text)) == expected
+
+
+def test_tool_call_ids_follow_source_order(model):
+    _, tool_calls = model._parse_all_tool_calls(
+        "<tool_call><tool_name>a</tool_name><q>1</q></tool_call>"
+        '[TOOL_CALL]\n{tool => "b", args => {--q 2}}\n[/TOOL_CALL]'
+    )
+    assert [tool_call.id for tool_call in tool_calls] == ["call_0", "call_1"]
+    assert all(tool_call.type == "function" for tool_call in tool_calls)